@@ -0,0 +1,401 @@
+import csv  # 清单文件解析
+import hashlib  # 备份文件校验和
+import io  # 内存字节流
+import json  # 导入日志和备份元数据
+import os  # 文件和目录操作
+import shutil  # 目录删除
+import tarfile  # 备份压缩包
+import time  # 时间处理
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait  # 多进程并行
+from datetime import datetime  # 日期时间处理
+
+import cv2  # OpenCV库，用于图像读取和人脸检测
+import numpy as np  # 数值计算库
+
+from face_quality import SAMPLE_TARGET  # 默认每人样本数
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+ARCHIVE_VERSION = 1  # 备份格式版本
+
+# 工作进程内的人脸检测器，由 init_worker() 创建
+worker_cascade = None
+
+
+def scan_folder(root):
+    """
+    扫描按人员分目录存放的图片（每个子目录一个人，目录名即用户名）
+    Args:
+        root: 根目录
+    Returns:
+        list: (key, name, 图片路径列表)，key 为子目录名
+    """
+    people = []
+    for entry in sorted(os.scandir(root), key=lambda entry: entry.name):
+        if not entry.is_dir():
+            continue
+        paths = []
+        for folder, _, files in os.walk(entry.path):
+            paths.extend(os.path.join(folder, name) for name in sorted(files)
+                         if name.lower().endswith(IMAGE_EXTENSIONS))
+        if paths:
+            people.append((entry.name, entry.name, paths))
+    return people
+
+
+def read_manifest(path):
+    """
+    读取CSV清单，必须包含 name 和 image 列，可选 key 列区分同名人员；
+    图片路径相对于清单文件所在目录
+    Args:
+        path: CSV文件路径
+    Returns:
+        list: (key, name, 图片路径列表)
+    Raises:
+        ValueError: 缺少必需的列
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    people = {}
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        if not {'name', 'image'} <= set(reader.fieldnames or ()):
+            raise ValueError("清单需要包含 name 和 image 列")
+        for row in reader:
+            name = row['name'].strip()
+            key = (row.get('key') or '').strip() or name
+            image = os.path.join(base, row['image'].strip())
+            people.setdefault(key, (key, name, []))[2].append(image)
+    return list(people.values())
+
+
+def init_worker():
+    """工作进程初始化：每个进程只加载一次检测器，并禁用OpenCV内部多线程"""
+    global worker_cascade
+    from face_engine import CASCADE_PATH
+
+    cv2.setNumThreads(1)
+    worker_cascade = cv2.CascadeClassifier(CASCADE_PATH)
+
+
+def extract_face(path, max_side=640, min_face=40):
+    """
+    读取图片并裁剪出其中最大的人脸
+    先缩小图片进行检测，再从原图中裁剪，检测耗时与原图分辨率无关
+    Args:
+        path: 图片路径
+        max_side: 检测时图片的最大边长
+        min_face: 缩小后图片上的最小人脸边长
+    Returns:
+        numpy.ndarray: 100x100灰度人脸，无法读取或未检测到人脸时为None
+    """
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    scale = min(1.0, max_side / max(image.shape))
+    small = image if scale == 1.0 else cv2.resize(image, None, fx=scale, fy=scale,
+                                                   interpolation=cv2.INTER_AREA)
+    faces = worker_cascade.detectMultiScale(small, scaleFactor=1.1, minNeighbors=5,
+                                            minSize=(min_face, min_face))
+    if len(faces) == 0:
+        return None
+    x, y, w, h = (int(round(v / scale)) for v in max(faces, key=lambda face: face[2] * face[3]))
+    return cv2.resize(image[y:y+h, x:x+w], (100, 100))
+
+
+def extract_person(task):
+    """
+    工作进程任务：裁剪一个人的所有图片中的人脸
+    Args:
+        task: (key, 图片路径列表, 最多样本数)
+    Returns:
+        tuple: (key, 形状为 (n, 100, 100) 的人脸数组, 失败的图片数)
+    """
+    key, paths, max_samples = task
+    faces = []
+    failed = 0
+    for path in paths:
+        if len(faces) >= max_samples:
+            break
+        face = extract_face(path)
+        if face is None:
+            failed += 1
+        else:
+            faces.append(face)
+    return key, np.array(faces, dtype=np.uint8).reshape(-1, 100, 100), failed
+
+
+class BulkImporter:
+    """
+    批量导入用户
+    多进程并行检测和裁剪人脸，每人的样本保存到 samples 目录，
+    进度写入导入日志；每个人员完成后立即加入图库，全部完成后一次性写出模型和用户数据。
+    中途失败后重新运行同一命令，已完成的人员直接读取保存的样本继续导入
+    """
+    def __init__(self, engine, workers=None, max_samples=SAMPLE_TARGET, on_progress=None):
+        """
+        初始化导入器
+        Args:
+            engine: 已加载的 FaceEngine 对象
+            workers: 工作进程数，默认为CPU核数
+            max_samples: 每人最多使用的样本数
+            on_progress: 可选，进度回调 on_progress(已完成人数, 总人数)
+        """
+        self.engine = engine
+        self.workers = workers or os.cpu_count() or 1
+        self.max_samples = max_samples
+        self.on_progress = on_progress
+        self.samples_dir = engine.samples_dir
+        self.journal_path = engine.journal_path
+        self.stats = {}
+        self.done = 0
+
+    def run(self, people):
+        """
+        导入人员列表
+        Args:
+            people: scan_folder() 或 read_manifest() 的返回值
+        Returns:
+            dict: 导入统计，包含 imported、skipped、failed、samples、elapsed
+        """
+        start = time.perf_counter()
+        os.makedirs(self.samples_dir, exist_ok=True)
+        existing = {info.get('import_key') for info in self.engine.users.values()}
+        names = {key: name for key, name, _ in people}
+        journal = self.engine.read_journal()
+        resumed = {
+            key: record for key, record in journal.items()
+            if key in names and key not in existing
+            and (record['user_id'] is None
+                 or os.path.exists(self.engine.sample_path(record['user_id'])))
+        }
+        todo = [(key, paths, self.max_samples) for key, _, paths in people
+                if key not in existing and key not in resumed]
+        skipped = sum(1 for key, _, _ in people if key in existing)
+        total = len(people) - skipped
+        self.stats = {'imported': 0, 'skipped': skipped, 'failed': [], 'samples': 0}
+        self.done = 0
+
+        # 每个人员完成后立即加入图库，最后一次性写出模型
+        self.engine.import_users(self.results(resumed, todo, names, total))
+        os.remove(self.journal_path)
+        self.stats['elapsed'] = time.perf_counter() - start
+        return self.stats
+
+    def results(self, resumed, todo, names, total):
+        """
+        依次产生续传人员和新完成人员的导入条目
+        Yields:
+            tuple: (user_id, user_info, histograms)
+        """
+        # 断点续传：已完成的人员直接读取保存的样本
+        for key, record in resumed.items():
+            faces = ()
+            if record['user_id'] is not None:
+                with np.load(self.engine.sample_path(record['user_id'])) as data:
+                    faces = data['faces']
+            yield from self.collect(key, names[key], faces, record['user_id'], total)
+
+        with open(self.journal_path, 'a', encoding='utf-8') as journal_file:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker) as executor:
+                pending = set()
+                tasks = iter(todo)
+                while True:
+                    # 在途任务数有上限，不会一次提交全部人员的任务
+                    for task in tasks:
+                        pending.add(executor.submit(extract_person, task))
+                        if len(pending) >= self.workers * 4:
+                            break
+                    if not pending:
+                        break
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        key, faces, failed = future.result()
+                        user_id = self.store(journal_file, key, faces, failed)
+                        yield from self.collect(key, names[key], faces, user_id, total)
+
+    def store(self, journal_file, key, faces, failed):
+        """
+        为检测到人脸的人员分配用户ID，先写入导入日志占用该ID，再保存样本
+        Returns:
+            int: 用户ID，没有可用样本时为None
+        """
+        user_id = self.engine.next_user_id() if len(faces) else None
+        journal_file.write(json.dumps({
+            'key': key, 'user_id': user_id,
+            'samples': len(faces), 'failed_images': failed,
+        }, ensure_ascii=False) + '\n')
+        journal_file.flush()
+        if user_id is not None:
+            self.engine.save_samples(user_id, faces)
+        return user_id
+
+    def collect(self, key, name, faces, user_id, total):
+        """计算样本直方图，产生导入条目并更新进度"""
+        if user_id is None:
+            self.stats['failed'].append(key)
+        else:
+            user_info = {
+                'name': name,
+                'registered_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'import_key': key,
+            }
+            self.stats['imported'] += 1
+            self.stats['samples'] += len(faces)
+            yield user_id, user_info, self.engine.histograms(faces)
+        self.done += 1
+        if self.on_progress is not None:
+            self.on_progress(self.done, total)
+
+
+def lbp_parameters(engine):
+    """返回图库使用的LBP参数字典"""
+    matcher = engine.matcher.shards[0] if engine.sharded else engine.matcher
+    return {
+        'radius': matcher.radius,
+        'neighbors': matcher.neighbors,
+        'grid_x': matcher.grid_x,
+        'grid_y': matcher.grid_y,
+    }
+
+
+def export_gallery(engine, path):
+    """
+    将整个图库（用户数据、样本直方图和样本文件）流式导出为一个 tar.gz 压缩包
+    逐个用户序列化写入，每个文件的SHA-256记录在最后的 checksums.json 中
+    Args:
+        engine: 已加载的 FaceEngine 对象
+        path: 压缩包路径
+    Returns:
+        int: 导出的用户数
+    """
+    checksums = {}
+
+    def add(tar, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(data))
+        checksums[name] = hashlib.sha256(data).hexdigest()
+
+    temp_path = path + '.tmp'
+    with engine.lock:
+        user_ids = engine.matcher.user_ids()
+        with tarfile.open(temp_path, 'w:gz') as tar:
+            metadata = {'version': ARCHIVE_VERSION, 'users': len(engine.users)}
+            metadata.update(lbp_parameters(engine))
+            metadata['preprocess'] = engine.preprocessor.config  # 直方图依赖预处理配置
+            add(tar, 'gallery.json', json.dumps(metadata).encode('utf-8'))
+            users = {str(user_id): info for user_id, info in engine.users.items()}
+            add(tar, 'users.json', json.dumps(users, ensure_ascii=False, default=str).encode('utf-8'))
+            for user_id in user_ids:
+                buffer = io.BytesIO()
+                np.save(buffer, engine.matcher.samples(user_id))
+                add(tar, f"gallery/{user_id}.npy", buffer.getvalue())
+            for user_id in engine.users:
+                sample_path = engine.sample_path(user_id)
+                if os.path.exists(sample_path):
+                    with open(sample_path, 'rb') as f:
+                        add(tar, f"samples/{user_id}.npz", f.read())
+            add(tar, 'checksums.json', json.dumps(checksums).encode('utf-8'))
+    os.replace(temp_path, path)
+    return len(engine.users)
+
+
+def restore_gallery(engine, path):
+    """
+    从 export_gallery() 导出的压缩包恢复图库，替换现有的全部用户和模型
+    压缩包按顺序流式读取，直方图逐个用户直接写入模型文件，内存占用与图库大小无关；
+    所有文件的校验和通过后才替换现有数据
+    Args:
+        engine: 已加载的 FaceEngine 对象
+        path: 压缩包路径
+    Returns:
+        int: 恢复的用户数
+    Raises:
+        ValueError: 压缩包格式错误或校验失败
+    """
+    from face_matcher import ModelWriter
+    from face_preprocess import FacePreprocessor
+
+    staged_samples = engine.samples_dir + '.restore'
+    model_paths = engine.model_files()
+    staged_paths = ['{0}.restore{1}'.format(*os.path.splitext(model_path))
+                    for model_path in model_paths]
+    shutil.rmtree(staged_samples, ignore_errors=True)
+    os.makedirs(staged_samples)
+
+    writers = []
+    users = None
+    preprocessor = FacePreprocessor()
+    expected = None
+    actual = {}
+    try:
+        try:
+            with tarfile.open(path, 'r|gz') as tar:
+                for member in tar:
+                    if not member.isfile():
+                        continue
+                    data = tar.extractfile(member).read()
+                    name = member.name
+                    if name == 'checksums.json':
+                        expected = json.loads(data)
+                        continue
+                    actual[name] = hashlib.sha256(data).hexdigest()
+                    folder, base = os.path.split(name)
+                    stem = os.path.splitext(base)[0]
+                    if name == 'gallery.json':
+                        metadata = json.loads(data)
+                        if metadata.get('version') != ARCHIVE_VERSION:
+                            raise ValueError(f"不支持的备份版本: {metadata.get('version')}")
+                        preprocessor = FacePreprocessor(**metadata.get('preprocess', {}))
+                        writers = [
+                            ModelWriter(staged, metadata['radius'], metadata['neighbors'],
+                                        metadata['grid_x'], metadata['grid_y'])
+                            for staged in staged_paths
+                        ]
+                    elif name == 'users.json':
+                        users = {int(user_id): info for user_id, info in json.loads(data).items()}
+                    elif folder == 'gallery':
+                        if not writers:
+                            raise ValueError("备份文件缺少 gallery.json")
+                        user_id = int(stem)
+                        index = engine.matcher.shard_index(user_id) if engine.sharded else 0
+                        writers[index].write(user_id, np.load(io.BytesIO(data)))
+                    elif folder == 'samples':
+                        with open(os.path.join(staged_samples, f"{int(stem)}.npz"), 'wb') as f:
+                            f.write(data)
+        finally:
+            for writer in writers:
+                writer.close()
+        if users is None or not writers:
+            raise ValueError("备份文件不完整")
+        if expected != actual:
+            raise ValueError("备份文件校验失败")
+    except (tarfile.TarError, EOFError, KeyError) as e:
+        discard_restore(staged_paths, staged_samples)
+        raise ValueError(f"备份文件损坏: {e}")
+    except Exception:
+        discard_restore(staged_paths, staged_samples)
+        raise
+
+    # 校验通过，替换现有数据
+    with engine.lock:
+        for staged, model_path in zip(staged_paths, model_paths):
+            os.replace(staged, model_path)
+        shutil.rmtree(engine.samples_dir, ignore_errors=True)
+        os.replace(staged_samples, engine.samples_dir)
+        if os.path.exists(engine.journal_path):
+            # 未完成的导入已保存的样本随旧数据一起被替换，日志中的记录不再有效
+            os.remove(engine.journal_path)
+        preprocessor.save(engine.preprocess_file)
+        engine.users = users
+        engine.save_users(merge=False)
+        engine.reload()
+    return len(users)
+
+
+def discard_restore(staged_paths, staged_samples):
+    """删除恢复失败时留下的临时文件"""
+    for staged in staged_paths:
+        if os.path.exists(staged):
+            os.remove(staged)
+    shutil.rmtree(staged_samples, ignore_errors=True)
@@ -0,0 +1,394 @@
+import time  # 时间处理
+START_TIME = time.perf_counter()  # 程序启动时刻，用于统计启动耗时
+import argparse  # 命令行参数解析
+import os  # 文件和目录操作
+import sys  # 系统模块
+
+
+def build_parser():
+    """创建命令行参数解析器"""
+    from face_quality import SAMPLE_TARGET
+
+    parser = argparse.ArgumentParser(description="人脸识别系统命令行工具（无界面）")
+    parser.add_argument('--data-dir', help="用户数据目录（默认 face_data）")
+    parser.add_argument('--model', help="模型文件路径（默认 face_model.yml）")
+    parser.add_argument('--shards', type=int, help="图库分片数（默认按已有分片文件自动确定）")
+    parser.add_argument('--timing', action='store_true', help="输出启动耗时等统计信息")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('users', help="列出已注册用户")
+
+    recognize = subparsers.add_parser('recognize', help="识别图片中的人脸")
+    recognize.add_argument('images', nargs='+', help="图片文件路径")
+    recognize.add_argument('--processes', type=int, default=0,
+                           help="使用多进程工作池识别（进程数，0 表示在当前进程中识别）")
+
+    serve = subparsers.add_parser('serve', help="启动本地识别服务（HTTP）")
+    serve.add_argument('--host', default='127.0.0.1', help="监听地址（默认 127.0.0.1）")
+    serve.add_argument('--port', type=int, default=8765, help="监听端口（默认 8765）")
+    serve.add_argument('--batch-window-ms', type=float, default=10, help="批处理收集窗口（毫秒）")
+    serve.add_argument('--max-batch', type=int, default=16, help="每批最多请求数")
+    serve.add_argument('--max-pending', type=int, default=64, help="同时处理的请求数上限，超出返回503")
+    serve.add_argument('--reload-interval', type=float, default=2.0,
+                       help="检查模型文件更新的间隔（秒），0 表示不热加载")
+
+    watch = subparsers.add_parser('watch', help="异步处理一个或多个视频源")
+    watch.add_argument('sources', nargs='+', help="摄像头编号、视频文件或流地址")
+    watch.add_argument('--workers', type=int, default=4, help="执行检测识别的线程数（每个视频源另有专用的读取线程）")
+    watch.add_argument('--reload-interval', type=float, default=2.0,
+                       help="检查模型文件更新的间隔（秒），0 表示不热加载")
+    watch.add_argument('--no-motion-gate', action='store_true', help="每帧都运行人脸检测")
+    watch.add_argument('--motion-sensitivity', type=float, default=0.005,
+                       help="变化像素占比超过此值视为有运动（越小越灵敏）")
+    watch.add_argument('--force-detect-interval', type=float, default=2.0,
+                       help="静止画面的强制检测间隔（秒），0 表示不强制")
+    watch.add_argument('--regions', help="各视频源检测区域和人脸尺寸范围的JSON配置文件")
+    watch.add_argument('--no-adaptive-scales', action='store_true',
+                       help="不根据已检测到的人脸尺寸自动收窄检测尺度")
+    watch.add_argument('--pacing', help="回放录像的节奏：realtime（原始帧率）、max（尽可能快）或帧率数字")
+    watch.add_argument('--record', help="将每帧的检测决策、识别结果和耗时写入此文件（JSON Lines）")
+    watch.add_argument('--quiet', action='store_true', help="不输出每张人脸的识别结果")
+
+    bulk = subparsers.add_parser('import', help="从图片目录或CSV清单批量导入用户")
+    bulk.add_argument('source', help="每人一个子目录的图片根目录，或包含 name,image 列的CSV清单")
+    bulk.add_argument('--workers', type=int, default=0, help="检测人脸的进程数（默认CPU核数）")
+    bulk.add_argument('--max-samples', type=int, default=SAMPLE_TARGET,
+                      help=f"每人最多使用的样本数（默认{SAMPLE_TARGET}，与界面录入相同）")
+
+    subparsers.add_parser('compact', help="重写模型文件，清除已删除用户残留的样本")
+
+    export = subparsers.add_parser('export', help="将整个图库导出为一个压缩包")
+    export.add_argument('archive', help="压缩包路径（.tar.gz）")
+
+    restore = subparsers.add_parser('restore', help="从压缩包恢复图库（替换现有数据）")
+    restore.add_argument('archive', help="export 导出的压缩包")
+    restore.add_argument('--force', action='store_true', help="已有用户时仍然覆盖")
+
+    preprocess = subparsers.add_parser('preprocess', help="查看或修改录入和识别共用的人脸预处理配置")
+    preprocess.add_argument('--equalize', choices=['none', 'hist', 'clahe'], help="直方图均衡化方法")
+    preprocess.add_argument('--clip-limit', type=float, help="CLAHE对比度限制")
+    preprocess.add_argument('--gamma', type=float, help="伽马值，大于1提亮暗部")
+    preprocess.add_argument('--align', action=argparse.BooleanOptionalAction, help="是否按双眼位置对齐人脸")
+    preprocess.add_argument('--force', action='store_true', help="存在无法重建的用户时仍然修改")
+
+    compare = subparsers.add_parser('compare', help="将回放记录与基准记录比较，发现性能或准确性回退")
+    compare.add_argument('baseline', help="基准记录文件")
+    compare.add_argument('current', help="本次记录文件")
+    compare.add_argument('--latency-tolerance', type=float, default=0.2,
+                         help="延迟中位数或P95允许增加的比例（默认 0.2）")
+    compare.add_argument('--max-mismatch', type=float, default=0.0,
+                         help="允许检测决策或识别结果不一致的帧比例（默认 0）")
+
+    return parser
+
+
+def start_model_watcher(engine, args):
+    """按 --reload-interval 启动模型热加载，返回监视器（未启用时为None）"""
+    if args.reload_interval <= 0:
+        return None
+    from face_engine import ModelWatcher
+
+    watcher = ModelWatcher(engine, interval=args.reload_interval)
+    watcher.start()
+    return watcher
+
+
+def cmd_users(engine, args):
+    """列出已注册用户"""
+    for user_id, user_info in sorted(engine.users.items()):
+        print(f"{user_id}\t{user_info['name']}\t注册时间: {user_info['registered_at']}"
+              f"\t上次验证: {user_info.get('last_verified', '从未')}")
+    return 0
+
+
+def format_face(prefix, face):
+    """格式化一张人脸的识别结果"""
+    name = face['name'] or "未识别"
+    confidence = face['confidence']
+    confidence = f"{confidence:.2f}" if confidence is not None else "-"
+    return f"{prefix}\t({','.join(map(str, face['box']))})\t{name}\t置信度: {confidence}"
+
+
+def cmd_recognize(engine, args):
+    """识别图片中的人脸，每张人脸输出一行结果"""
+    import cv2  # 仅在需要读取图片时导入
+
+    status = 0
+    readable = []
+    for path in args.images:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            print(f"{path}\t无法读取图片", file=sys.stderr)
+            status = 1
+            continue
+        readable.append((path, gray))
+
+    if args.processes > 0:
+        from face_workers import RecognitionPool
+
+        max_shape = (max(gray.shape[0] for _, gray in readable),
+                     max(gray.shape[1] for _, gray in readable)) if readable else (1, 1)
+        try:
+            with RecognitionPool(workers=args.processes, max_shape=max_shape,
+                                 data_dir=engine.data_dir, model_path=engine.model_path,
+                                 shards=engine.shards, engine=engine) as pool:
+                results = list(pool.map(gray for _, gray in readable))
+        except RuntimeError as e:
+            print(f"多进程识别失败: {e}", file=sys.stderr)
+            return 1
+    else:
+        results = [engine.analyze(gray) for _, gray in readable]
+
+    for (path, _), faces in zip(readable, results):
+        if not faces:
+            print(f"{path}\t未检测到人脸")
+        for face in faces:
+            print(format_face(path, face))
+    return status
+
+
+def cmd_serve(engine, args):
+    """启动本地识别服务"""
+    from face_service import serve
+
+    watcher = start_model_watcher(engine, args)
+    try:
+        serve(
+            engine,
+            host=args.host,
+            port=args.port,
+            batch_window=args.batch_window_ms / 1000,
+            max_batch=args.max_batch,
+            max_pending=args.max_pending,
+        )
+    finally:
+        if watcher is not None:
+            watcher.stop()
+    return 0
+
+
+def cmd_watch(engine, args):
+    """异步处理视频源，输出每帧的识别结果，Ctrl+C 停止"""
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from face_detection import DetectionRegion, MotionGate, load_regions
+    from face_replay import FrameRecorder, parse_pacing
+    from face_stream import watch_sources
+
+    sources = [int(source) if source.isdigit() else source for source in args.sources]
+    try:
+        pacing = parse_pacing(args.pacing) if args.pacing else None
+    except ValueError as e:
+        print(f"回放节奏无效: {e}", file=sys.stderr)
+        return 1
+
+    gates = []
+
+    def create_gate():
+        """为每个视频源创建独立的运动门控"""
+        gate = MotionGate(sensitivity=args.motion_sensitivity,
+                          force_interval=args.force_detect_interval)
+        gates.append(gate)
+        return gate
+
+    recorder = FrameRecorder(args.record) if args.record else None
+
+    def on_result(source, result):
+        if recorder is not None:
+            # 多个视频源时按视频源区分记录
+            recorder.record(result['index'], result['detected'], result['faces'],
+                            result['latency_ms'], source if len(sources) > 1 else None)
+        if not args.quiet:
+            for face in result['faces']:
+                print(format_face(f"{source}#{result['index']}", face))
+
+    try:
+        regions = load_regions(args.regions) if args.regions else {}
+    except (OSError, ValueError, TypeError) as e:
+        print(f"无法读取检测区域配置: {e}", file=sys.stderr)
+        return 1
+
+    def create_region(source):
+        """配置文件中的区域优先，其余视频源只做自适应尺度"""
+        region = regions.get(str(source))
+        if region is None and not args.no_adaptive_scales:
+            region = DetectionRegion()
+        if region is not None and args.no_adaptive_scales:
+            region.adaptive = False
+        return region
+
+    watcher = start_model_watcher(engine, args)
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    try:
+        asyncio.run(watch_sources(engine, sources, on_result, executor,
+                                  None if args.no_motion_gate else create_gate, create_region,
+                                  pacing))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        executor.shutdown(wait=True)
+        if watcher is not None:
+            watcher.stop()
+        if recorder is not None:
+            recorder.close()
+    if args.timing:
+        for gate in gates:
+            print(f"检测帧占比: {gate.detections}/{gate.frames} ({gate.detection_ratio:.0%})",
+                  file=sys.stderr)
+    return 0
+
+
+def cmd_import(engine, args):
+    """批量导入用户，中断后重新运行同一命令即可继续"""
+    from face_bulk import BulkImporter, read_manifest, scan_folder
+
+    try:
+        if os.path.isdir(args.source):
+            people = scan_folder(args.source)
+        else:
+            people = read_manifest(args.source)
+    except (OSError, ValueError) as e:
+        print(f"无法读取导入源: {e}", file=sys.stderr)
+        return 1
+
+    last_report = [0.0]
+
+    def on_progress(done, total):
+        now = time.perf_counter()
+        if done == total or now - last_report[0] >= 0.5:
+            last_report[0] = now
+            print(f"\r导入进度: {done}/{total}", end='', file=sys.stderr, flush=True)
+
+    importer = BulkImporter(engine, workers=args.workers or None,
+                            max_samples=args.max_samples, on_progress=on_progress)
+    stats = importer.run(people)
+    print(file=sys.stderr)
+    print(f"导入 {stats['imported']} 人，样本 {stats['samples']} 张，"
+          f"跳过已导入 {stats['skipped']} 人，耗时 {stats['elapsed']:.1f} 秒")
+    for key in stats['failed']:
+        print(f"{key}\t未检测到人脸", file=sys.stderr)
+    return 1 if stats['failed'] else 0
+
+
+def cmd_compact(engine, args):
+    """压缩模型文件"""
+    removed_samples, removed_files = engine.compact()
+    print(f"已移除 {removed_samples} 个残留样本，{removed_files} 个样本文件")
+    return 0
+
+
+def cmd_export(engine, args):
+    """导出图库备份"""
+    from face_bulk import export_gallery
+
+    start = time.perf_counter()
+    count = export_gallery(engine, args.archive)
+    print(f"已导出 {count} 个用户到 {args.archive}，耗时 {time.perf_counter() - start:.1f} 秒")
+    return 0
+
+
+def cmd_restore(engine, args):
+    """从备份恢复图库"""
+    from face_bulk import restore_gallery
+
+    if engine.users and not args.force:
+        print(f"当前已有 {len(engine.users)} 个用户，恢复会覆盖现有数据，请加 --force 确认",
+              file=sys.stderr)
+        return 1
+    try:
+        count = restore_gallery(engine, args.archive)
+    except (OSError, ValueError) as e:
+        print(f"恢复失败: {e}", file=sys.stderr)
+        return 1
+    print(f"已恢复 {count} 个用户")
+    return 0
+
+
+def cmd_preprocess(engine, args):
+    """查看或修改预处理配置，保存了原始样本的用户会按新配置重建"""
+    from face_preprocess import FacePreprocessor
+
+    config = engine.preprocessor.config
+    changes = {
+        'equalize': None if args.equalize == 'none' else args.equalize,
+        'clip_limit': args.clip_limit,
+        'gamma': args.gamma,
+        'align': args.align,
+    }
+    for key, value in changes.items():
+        if value is not None or (key == 'equalize' and args.equalize == 'none'):
+            config[key] = value
+    try:
+        preprocessor = FacePreprocessor(**config)
+    except ValueError as e:
+        print(f"预处理配置无效: {e}", file=sys.stderr)
+        return 1
+
+    if preprocessor != engine.preprocessor:
+        stale = [user_id for user_id in engine.users
+                 if not os.path.exists(engine.sample_path(user_id))]
+        if stale and not args.force:
+            print(f"{len(stale)} 个用户没有保存原始样本，修改后需要重新采集，请加 --force 确认",
+                  file=sys.stderr)
+            return 1
+        stale = engine.set_preprocessing(preprocessor)
+        print(f"预处理配置已更新，{len(engine.users) - len(stale)} 个用户已重建")
+    for key, value in preprocessor.config.items():
+        print(f"{key}\t{value}")
+    return 0
+
+
+def cmd_compare(engine, args):
+    """比较两次回放记录，有回退时返回1"""
+    from face_replay import compare_runs
+
+    try:
+        report = compare_runs(args.baseline, args.current,
+                              latency_tolerance=args.latency_tolerance,
+                              max_mismatch=args.max_mismatch)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"无法读取记录文件: {e}", file=sys.stderr)
+        return 1
+    print(f"比较 {report['frames']} 帧，不一致 {report['mismatched']} 帧")
+    for name, (before, after) in report['latency'].items():
+        print(f"延迟{name}: {before:.2f} ms -> {after:.2f} ms")
+    for message in report['regressions']:
+        print(f"回退: {message}")
+    return 1 if report['regressions'] else 0
+
+
+COMMANDS = {
+    'users': cmd_users,
+    'recognize': cmd_recognize,
+    'serve': cmd_serve,
+    'watch': cmd_watch,
+    'import': cmd_import,
+    'compact': cmd_compact,
+    'export': cmd_export,
+    'restore': cmd_restore,
+    'preprocess': cmd_preprocess,
+    'compare': cmd_compare,
+}
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = build_parser().parse_args(argv)
+    if args.command == 'compare':
+        # 只比较记录文件，不需要加载模型
+        return cmd_compare(None, args)
+
+    # 引擎只依赖OpenCV和numpy，不会导入tkinter或PIL
+    from face_engine import FaceEngine
+    import_time = time.perf_counter() - START_TIME
+    engine = FaceEngine(data_dir=args.data_dir, model_path=args.model, shards=args.shards)
+    engine.load()
+    if args.timing:
+        print(f"启动耗时: 导入 {import_time * 1000:.0f} ms, 模型加载 {engine.load_time * 1000:.0f} ms",
+              file=sys.stderr)
+
+    return COMMANDS[args.command](engine, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
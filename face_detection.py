@@ -0,0 +1,218 @@
+import json  # 区域配置文件
+import time  # 时间处理
+from collections import deque  # 最近的人脸尺寸
+
+import cv2  # OpenCV库，用于图像处理
+import numpy as np  # 数值计算库
+
+
+class MotionGate:
+    """
+    运动门控
+    在缩小的灰度图上与滑动平均背景做帧差，只有画面中有运动、
+    仍在跟踪人脸或距上次检测超过强制间隔时才运行人脸检测，
+    静止场景下检测器基本处于空闲状态
+    """
+    def __init__(self, sensitivity=0.005, pixel_threshold=20, width=80,
+                 learning_rate=0.05, hold_frames=15, force_interval=2.0):
+        """
+        初始化运动门控
+        Args:
+            sensitivity: 变化像素占比超过此值视为有运动，越小越灵敏
+            pixel_threshold: 单个像素与背景的灰度差超过此值视为变化
+            width: 计算帧差时缩小到的宽度
+            learning_rate: 背景滑动平均的更新速度
+            hold_frames: 运动停止后继续检测的帧数
+            force_interval: 强制检测间隔（秒），0 表示不强制
+        """
+        self.sensitivity = sensitivity
+        self.pixel_threshold = pixel_threshold
+        self.width = width
+        self.learning_rate = learning_rate
+        self.hold_frames = hold_frames
+        self.force_interval = force_interval
+        self.background = None
+        self.hold = 0
+        self.last_detection = 0.0
+        self.motion_score = 0.0  # 最近一帧的变化像素占比
+        self.frames = 0  # 已处理帧数
+        self.detections = 0  # 实际运行检测的帧数
+
+    def reset(self):
+        """清除背景模型（切换视频源或摄像头移动后调用）"""
+        self.background = None
+        self.hold = 0
+        self.last_detection = 0.0
+
+    def should_detect(self, gray, tracking=False, now=None):
+        """
+        判断当前帧是否需要运行人脸检测
+        Args:
+            gray: 当前帧灰度图像
+            tracking: 上一次检测是否发现了人脸
+            now: 可选，当前帧的时间（秒），回放录像时使用录像时间，默认为系统时钟
+        Returns:
+            bool: 是否运行检测
+        """
+        self.frames += 1
+        height, width = gray.shape[:2]
+        small_size = (self.width, max(1, round(height * self.width / width)))
+        small = cv2.resize(gray, small_size, interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (5, 5), 0).astype(np.float32)
+
+        if self.background is None or self.background.shape != small.shape:
+            self.background = small
+            motion = True
+        else:
+            changed = cv2.absdiff(small, self.background) > self.pixel_threshold
+            self.motion_score = float(np.count_nonzero(changed)) / changed.size
+            motion = self.motion_score > self.sensitivity
+            cv2.accumulateWeighted(small, self.background, self.learning_rate)
+
+        if motion:
+            self.hold = self.hold_frames
+        elif self.hold > 0:
+            self.hold -= 1
+
+        if now is None:
+            now = time.monotonic()
+        forced = self.force_interval > 0 and now - self.last_detection >= self.force_interval
+        detect = motion or self.hold > 0 or tracking or forced
+        if detect:
+            self.last_detection = now
+            self.detections += 1
+        return detect
+
+    @property
+    def detection_ratio(self):
+        """实际运行检测的帧占比"""
+        return self.detections / self.frames if self.frames else 0.0
+
+
+class DetectionRegion:
+    """
+    单个视频源的检测区域与人脸尺寸范围
+    检测前先裁剪到多边形区域的外接矩形，并用 minSize/maxSize 限制扫描的尺度，
+    级联分类器需要评估的窗口数大幅减少；开启自适应后根据已检测到的人脸尺寸
+    收窄尺寸范围，并定期用完整范围检测一次以适应场景变化
+    """
+    def __init__(self, polygon=None, min_face=60, max_face=None, adaptive=True,
+                 history=200, warmup=30, margin=0.3, full_scan_interval=50):
+        """
+        初始化检测区域
+        Args:
+            polygon: 可选，多边形顶点 [(x, y), ...]，坐标为相对画面宽高的比例 (0~1)
+            min_face: 最小人脸边长（像素）
+            max_face: 可选，最大人脸边长（像素）
+            adaptive: 是否根据观测到的人脸尺寸自动收窄范围
+            history: 参与统计的最近人脸数量
+            warmup: 开始自适应前至少需要观测到的人脸数量
+            margin: 自适应范围在观测分布两端各放宽的比例
+            full_scan_interval: 每隔多少次检测使用一次完整尺寸范围
+        """
+        self.polygon = np.array(polygon, dtype=np.float32) if polygon is not None else None
+        self.min_face = min_face
+        self.max_face = max_face
+        self.adaptive = adaptive
+        self.warmup = warmup
+        self.margin = margin
+        self.full_scan_interval = full_scan_interval
+        self.sizes = deque(maxlen=history)
+        self.band = None  # 缓存的自适应尺寸范围
+        self.calls = 0
+        self.frame_shape = None  # 缓存多边形像素坐标对应的画面尺寸
+        self.contour = None
+        self.bounds = None
+
+    @classmethod
+    def from_dict(cls, config):
+        """从配置字典创建（键与构造参数同名）"""
+        return cls(**config)
+
+    def reset(self):
+        """清除已观测的人脸尺寸"""
+        self.sizes.clear()
+        self.band = None
+        self.calls = 0
+
+    def crop(self, gray):
+        """
+        裁剪出多边形的外接矩形
+        Args:
+            gray: 灰度图像
+        Returns:
+            tuple: (裁剪后的图像, 左上角x, 左上角y)
+        """
+        if self.polygon is None:
+            return gray, 0, 0
+        if self.frame_shape != gray.shape[:2]:
+            height, width = gray.shape[:2]
+            points = np.round(self.polygon * (width, height)).astype(np.int32)
+            self.contour = points.reshape(-1, 1, 2)
+            x, y, w, h = cv2.boundingRect(self.contour)
+            x0, y0 = max(x, 0), max(y, 0)
+            self.bounds = (x0, y0, min(x + w, width), min(y + h, height))
+            self.frame_shape = gray.shape[:2]
+        x0, y0, x1, y1 = self.bounds
+        return gray[y0:y1, x0:x1], x0, y0
+
+    def size_range(self):
+        """
+        本次检测使用的 minSize 和 maxSize
+        Returns:
+            tuple: (minSize, maxSize)，maxSize 为 (0, 0) 表示不限制
+        """
+        self.calls += 1
+        min_face, max_face = self.min_face, self.max_face
+        full_scan = self.full_scan_interval > 0 and self.calls % self.full_scan_interval == 0
+        if self.adaptive and len(self.sizes) >= self.warmup and not full_scan:
+            if self.band is None:
+                low, high = np.percentile(np.fromiter(self.sizes, dtype=np.float32), (5, 95))
+                self.band = (int(low * (1 - self.margin)), int(high * (1 + self.margin)) + 1)
+            min_face = max(min_face, self.band[0])
+            max_face = self.band[1] if max_face is None else min(max_face, self.band[1])
+        if max_face is None:
+            return (min_face, min_face), (0, 0)
+        max_face = max(max_face, min_face)
+        return (min_face, min_face), (max_face, max_face)
+
+    def accept(self, faces, x0, y0):
+        """
+        将裁剪区域内的检测结果换算回原图坐标，丢弃中心不在多边形内的人脸，
+        并记录人脸尺寸用于自适应
+        Args:
+            faces: 裁剪图像上的人脸矩形序列
+            x0, y0: 裁剪区域左上角
+        Returns:
+            numpy.ndarray: 原图上的人脸矩形，形状为 (N, 4)
+        """
+        faces = np.asarray(faces, dtype=np.int32).reshape(-1, 4)
+        if len(faces) == 0:
+            return faces
+        faces[:, 0] += x0
+        faces[:, 1] += y0
+        if self.contour is not None and self.polygon is not None:
+            inside = [
+                cv2.pointPolygonTest(self.contour, (float(x + w / 2), float(y + h / 2)), False) >= 0
+                for (x, y, w, h) in faces
+            ]
+            faces = faces[inside]
+        if self.adaptive and len(faces):
+            self.sizes.extend(faces[:, 2].tolist())
+            self.band = None
+        return faces
+
+
+def load_regions(path):
+    """
+    读取各视频源的检测区域配置
+    配置文件为JSON对象，键为视频源（摄像头编号或地址），值为 DetectionRegion 参数，例如
+    {"0": {"polygon": [[0.2, 0.1], [0.8, 0.1], [0.8, 0.9], [0.2, 0.9]], "min_face": 80}}
+    Args:
+        path: 配置文件路径
+    Returns:
+        dict: 视频源字符串 -> DetectionRegion
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    return {str(source): DetectionRegion.from_dict(options) for source, options in config.items()}
@@ -1,29 +1,43 @@
+import time  # 时间处理
+START_TIME = time.perf_counter()  # 程序启动时刻，用于统计启动耗时
 import cv2  # OpenCV库，用于图像处理和人脸识别
 import numpy as np  # 数值计算库
 import tkinter as tk  # GUI库
 from tkinter import ttk, messagebox  # GUI组件和消息框
-from PIL import Image, ImageTk, ImageDraw, ImageFont  # 图像处理库，用于GUI中显示图像
 import threading  # 多线程处理
-import time  # 时间处理
-import os  # 文件和目录操作
-import pickle  # 数据序列化
 from datetime import datetime  # 日期时间处理
 import re  # 正则表达式模块
-import sys  # 系统模块
+import argparse  # 命令行参数解析
+from face_engine import FaceEngine, ModelWatcher, face_result, get_resource_path  # 无界面的检测识别引擎
+from face_quality import SAMPLE_TARGET, SampleSelector  # 录入样本质量与多样性筛选
+from face_detection import DetectionRegion, MotionGate  # 运动门控与自适应检测尺度
+from face_replay import FrameRecorder, open_capture, parse_pacing  # 摄像头或录像回放
+# PIL仅在显示视频时使用，首次使用时再导入，见 load_pil()
+Image = ImageTk = ImageDraw = ImageFont = None
 
 class FaceRecognitionSystem:
     """
     人脸识别系统主类
     实现了人脸录入、识别和用户管理功能
     """
-    def __init__(self, window):
+    def __init__(self, window, video_source=0, pacing=None, record_path=None,
+                 sample_target=SAMPLE_TARGET):
         """
         初始化人脸识别系统
         Args:
             window: tkinter主窗口对象
+            video_source: 摄像头编号，或要回放的视频文件/图片目录
+            pacing: 可选，回放节奏 'realtime'、'max' 或帧率
+            record_path: 可选，逐帧记录检测决策和耗时的文件
+            sample_target: 录入和重新采集时每人采集的样本数
         """
         # 设置主窗口
         self.window = window
+        self.video_source = video_source
+        self.pacing = pacing
+        self.record_path = record_path
+        self.sample_target = sample_target
+        self.recorder = None  # 逐帧记录器，仅在视频处理线程中使用
         self.window.title("人脸识别系统")
         # 调整窗口大小以适应更大的视频显示
         self.window.geometry("1200x800")
@@ -32,27 +46,11 @@ class FaceRecognitionSystem:
         self.video_width = 840  # 16:9 比例
         self.video_height = 480
         
-        # 初始化人脸识别模型
-        try:
-            # 加载人脸检测器（Haar级联分类器）
-            self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            # 创建LBPH人脸识别器
-            self.face_recognizer = cv2.face.LBPHFaceRecognizer_create()
-        except AttributeError:
-            # 如果没有安装OpenCV contrib模块，显示错误信息
-            messagebox.showerror("错误", "请安装 OpenCV contrib 模块：\npip install opencv-contrib-python")
-            self.window.destroy()
-            return
-        
-        # 修改数据目录和模型文件的路径
-        self.data_dir = self.get_resource_path("face_data")
-        self.model_path = self.get_resource_path("face_model.yml")
-        os.makedirs(self.data_dir, exist_ok=True)
-        
-        # 加载用户数据和模型
-        self.users = self.load_users()  # 加载用户信息
-        if os.path.exists(self.model_path):
-            self.face_recognizer.read(self.model_path)  # 如果存在模型文件则加载
+        # 创建识别引擎，模型和用户数据在窗口显示后于后台线程加载
+        self.engine = FaceEngine(
+            data_dir=self.get_resource_path("face_data"),
+            model_path=self.get_resource_path("face_model.yml")
+        )
         
         # 设置主题颜色
         self.colors = {
@@ -90,6 +88,53 @@ class FaceRecognitionSystem:
         
         # 初始化GUI界面
         self.setup_gui()
+        self.window_time = time.perf_counter() - START_TIME  # 窗口就绪耗时
+        
+        # 后台加载模型和用户数据，加载完成前禁用录入和验证
+        self.register_button.config(state=tk.DISABLED)
+        self.verify_button.config(state=tk.DISABLED)
+        self.status_label.config(text="状态: 加载中...")
+        threading.Thread(target=self.load_engine, daemon=True).start()
+        
+    def load_engine(self):
+        """在后台线程中加载模型和用户数据"""
+        try:
+            self.engine.load()
+        except AttributeError:
+            # 如果没有安装OpenCV contrib模块，显示错误信息
+            self.window.after(0, self.on_engine_failed, "请安装 OpenCV contrib 模块：\npip install opencv-contrib-python")
+        except Exception as e:
+            print(f"加载错误: {e}")
+            self.window.after(0, self.on_engine_failed, f"加载模型失败: {str(e)}")
+        else:
+            self.window.after(0, self.on_engine_loaded)
+        
+    def on_engine_loaded(self):
+        """模型加载完成后在主线程中恢复界面"""
+        self.update_users_list()
+        self.register_button.config(state=tk.NORMAL)
+        self.verify_button.config(state=tk.NORMAL)
+        self.status_label.config(text="状态: 就绪")
+        
+        # 监视模型文件，其他录入终端更新模型后自动热加载
+        self.model_watcher = ModelWatcher(
+            self.engine,
+            on_reload=lambda: self.window.after(0, self.on_model_reloaded)
+        )
+        self.model_watcher.start()
+        
+        total_time = time.perf_counter() - START_TIME
+        print(f"启动耗时: 窗口 {self.window_time * 1000:.0f} ms, "
+              f"模型加载 {self.engine.load_time * 1000:.0f} ms, 总计 {total_time * 1000:.0f} ms")
+        
+    def on_model_reloaded(self):
+        """模型热加载后刷新用户列表"""
+        self.update_users_list(self.search_var.get().lower())
+        
+    def on_engine_failed(self, message):
+        """模型加载失败时提示并退出"""
+        messagebox.showerror("错误", message)
+        self.window.destroy()
         
     def setup_gui(self):
         """
@@ -280,25 +325,13 @@ class FaceRecognitionSystem:
         self.cap = None  # 摄像头对象
         self.current_mode = None  # 当前模式（注册/验证）
         self.face_samples = []  # 人脸样本列表
+        self.sample_selector = None  # 录入样本选择器
+        self.roi_batch = np.empty((4, 100, 100), dtype=np.uint8)  # 批量识别的预分配人脸数组
+        self.font = None  # 状态文字字体
+        self.motion_gate = MotionGate()  # 运动门控，画面静止时跳过检测
+        self.last_faces = ()  # 最近一次检测到的人脸
+        self.detection_region = DetectionRegion()  # 根据人脸尺寸自适应的检测尺度
         
-    def load_users(self):
-        """
-        从文件加载用户数据
-        Returns:
-            dict: 用户数据字典，如果文件不存在则返回空字典
-        """
-        users_file = os.path.join(self.data_dir, "users.pkl")
-        if os.path.exists(users_file):
-            with open(users_file, 'rb') as f:
-                return pickle.load(f)
-        return {}
-        
-    def save_users(self):
-        """保存用户数据到文件"""
-        users_file = os.path.join(self.data_dir, "users.pkl")
-        with open(users_file, 'wb') as f:
-            pickle.dump(self.users, f)
-            
     def update_users_list(self, search_text=''):
         """
         更新用户列表显示
@@ -307,7 +340,7 @@ class FaceRecognitionSystem:
         """
         self.users_listbox.delete(0, tk.END)
         sorted_users = sorted(
-            self.users.items(), 
+            self.engine.users.items(), 
             key=lambda x: x[1]['registered_at'],
             reverse=True  # 最新注册的用户显示在前面
         )
@@ -328,9 +361,10 @@ class FaceRecognitionSystem:
             return
             
         self.current_mode = 'register'
-        self.face_samples = []
+        self.sample_selector = SampleSelector(target=self.sample_target)
+        self.face_samples = self.sample_selector.samples
         self.start_camera()
-        self.status_label.config(text="状态: 录入中 (需要采集20张人脸样本)")
+        self.status_label.config(text=f"状态: 录入中 (需要采集{self.sample_target}张人脸样本)")
         
     def start_verification(self):
         """开始人脸验证流程"""
@@ -339,9 +373,26 @@ class FaceRecognitionSystem:
         self.status_label.config(text="状态: 验证中")
         
     def start_camera(self):
-        """启动摄像头和视频处理线程"""
+        """
+        启动摄像头和视频处理线程
+        Returns:
+            bool: 是否成功打开视频源
+        """
+        try:
+            self.cap = open_capture(self.video_source, self.pacing)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return False
+        if not self.cap.isOpened():
+            self.cap.release()
+            self.cap = None
+            messagebox.showerror("错误", "无法打开摄像头")
+            return False
         self.is_running = True
-        self.cap = cv2.VideoCapture(0)
+        self.motion_gate.reset()
+        self.detection_region.reset()
+        self.last_faces = ()
+        self.recorder = FrameRecorder(self.record_path) if self.record_path else None
         
         # 设置摄像头捕获分辨率
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.video_width)
@@ -355,12 +406,17 @@ class FaceRecognitionSystem:
         # 在新线程中运行视频处理
         self.video_thread = threading.Thread(target=self.update_frame, daemon=True)
         self.video_thread.start()
+        return True
         
     def stop_camera(self):
         """停止摄像头和视频处理"""
         if hasattr(self, 'is_running'):
             self.is_running = False
         
+        # 写入尚未保存的验证时间
+        if hasattr(self, 'engine'):
+            self.engine.flush_verifications()
+        
         # 清除验证结果
         if hasattr(self, 'last_verify_result'):
             delattr(self, 'last_verify_result')
@@ -388,12 +444,17 @@ class FaceRecognitionSystem:
         
     def update_frame(self):
         """更新视频帧"""
+        frame_index = 0
+        # 只使用和关闭本线程启动时的视频源和记录器，停止后很快重新开始时不会影响新会话
+        cap, recorder = self.cap, self.recorder
         try:
-            while self.is_running and self.cap is not None:
-                ret, frame = self.cap.read()
+            while self.is_running and self.cap is cap:
+                ret, frame = cap.read()
                 if not ret:
                     print("无法读取视频帧")
                     break
+                frame_start = time.perf_counter()
+                frame_index += 1
                 
                 # 获取当前视频标签的大小
                 label_width = self.video_label.winfo_width()
@@ -419,15 +480,19 @@ class FaceRecognitionSystem:
                 # 转换为灰度图像用于人脸检测
                 gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
                 
-                # 检测人脸
-                faces = self.face_cascade.detectMultiScale(
-                    gray,
-                    scaleFactor=1.1,
-                    minNeighbors=5,
-                    minSize=(60, 60)
-                )
+                # 检测人脸：画面静止且没有正在跟踪的人脸时跳过检测
+                # 回放录像时以录像时间驱动门控，保证每次回放的决策一致
+                detected = self.motion_gate.should_detect(
+                    gray, tracking=len(self.last_faces) > 0,
+                    now=getattr(cap, 'timestamp', None))
+                if detected:
+                    self.last_faces = self.engine.detect(gray, self.detection_region)
+                    faces = self.last_faces
+                else:
+                    faces = ()
                 
                 # 处理检测到的每个人脸
+                verify_rois = []
                 for (x, y, w, h) in faces:
                     # 绘制边框
                     cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
@@ -435,7 +500,20 @@ class FaceRecognitionSystem:
                     if self.current_mode in ['register', 'recapture']:
                         self.handle_registration(gray[y:y+h, x:x+w])
                     elif self.current_mode == 'verify':
-                        self.handle_verification(gray[y:y+h, x:x+w])
+                        verify_rois.append(gray[y:y+h, x:x+w])
+                
+                # 同一帧的所有人脸一次性批量识别
+                results = []
+                if verify_rois:
+                    results = self.handle_verification_batch(verify_rois)
+                
+                if recorder is not None:
+                    if results:
+                        recorded = [face_result(box, *result) for box, result in zip(faces, results)]
+                    else:
+                        recorded = [face_result(box, -1, float('inf'), None) for box in faces]
+                    latency_ms = (time.perf_counter() - frame_start) * 1000
+                    recorder.record(frame_index, detected, recorded, latency_ms)
                 
                 # 添加状态颜色块
                 status_color = None
@@ -450,7 +528,7 @@ class FaceRecognitionSystem:
                             status_text = "验证失败"
                 elif self.current_mode in ['register', 'recapture']:
                     status_color = (255, 128, 0)  # 蓝色，录入/采集中
-                    status_text = f"采集中: {len(self.face_samples)}/20"
+                    status_text = f"采集中: {len(self.face_samples)}/{self.sample_target}"
                 
                 # 如果有状态颜色，绘制状态块和文字
                 if status_color is not None:
@@ -482,6 +560,7 @@ class FaceRecognitionSystem:
                 
                 # 直接更新GUI
                 try:
+                    load_pil()
                     frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                     image = Image.fromarray(frame_rgb)
                     photo = ImageTk.PhotoImage(image=image)
@@ -493,7 +572,12 @@ class FaceRecognitionSystem:
         except Exception as e:
             print(f"视频处理错误: {e}")
         finally:
-            self.stop_camera()
+            if recorder is not None:
+                recorder.close()
+                if self.recorder is recorder:
+                    self.recorder = None
+            if self.cap is cap:
+                self.stop_camera()
             
     def handle_registration(self, face_roi):
         """
@@ -502,12 +586,15 @@ class FaceRecognitionSystem:
             face_roi: 人脸区域图像
         """
         try:
-            if len(self.face_samples) < 20:
-                face_roi = cv2.resize(face_roi, (100, 100))
-                self.face_samples.append(face_roi)
-                self.status_label.config(text=f"状态: 录入中 ({len(self.face_samples)}/20)")
+            if len(self.face_samples) < self.sample_target:
+                # 只保留清晰、正脸且与已有样本有差异的人脸
+                accepted, reason = self.sample_selector.offer(face_roi)
+                if not accepted:
+                    self.status_label.config(text=f"状态: 录入中 ({len(self.face_samples)}/{self.sample_target}) {reason}")
+                    return
+                self.status_label.config(text=f"状态: 录入中 ({len(self.face_samples)}/{self.sample_target})")
                 
-                if len(self.face_samples) == 20:
+                if len(self.face_samples) == self.sample_target:
                     # 使用after方法在主线程中执行完成操作
                     self.window.after(100, self.complete_capture)
         except Exception as e:
@@ -531,20 +618,11 @@ class FaceRecognitionSystem:
     def complete_registration(self):
         """完成人脸注册流程"""
         try:
-            # 创建新用户
-            user_id = len(self.users)
-            self.users[user_id] = {
+            # 创建新用户，训练并保存模型和用户数据
+            self.engine.register_user({
                 'name': self.username_var.get(),
                 'registered_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            
-            # 训练人脸识别模型
-            labels = [user_id] * len(self.face_samples)
-            self.face_recognizer.train(self.face_samples, np.array(labels))
-            
-            # 保存模型和用户数据
-            self.face_recognizer.save(self.model_path)
-            self.save_users()
+            }, self.face_samples)
             self.update_users_list()
             
             messagebox.showinfo("成功", "人脸录入完成！")
@@ -552,41 +630,61 @@ class FaceRecognitionSystem:
             messagebox.showerror("错误", f"注册失败: {str(e)}")
             print(f"注册错误: {e}")
 
-    def handle_verification(self, face_roi):
+    def handle_verification_batch(self, face_rois):
         """
-        处理人脸验证
+        批量处理同一帧中的多张人脸验证
+        所有人脸缩放到预分配的 N×100×100 数组中一起识别，
+        状态栏每帧只更新一次，验证时间由引擎合并后定期写入文件
         Args:
-            face_roi: 人脸区域图像
+            face_rois: 人脸区域图像列表
+        Returns:
+            list: 每张人脸的 (用户ID, 置信度, 用户信息)，出错时为空列表
         """
         try:
-            face_roi = cv2.resize(face_roi, (100, 100))
-            user_id, confidence = self.face_recognizer.predict(face_roi)
+            count = len(face_rois)
+            if self.roi_batch.shape[0] < count:
+                self.roi_batch = np.empty((count, 100, 100), dtype=np.uint8)
+            batch = self.roi_batch[:count]
+            for i, face_roi in enumerate(face_rois):
+                cv2.resize(face_roi, (100, 100), dst=batch[i])
+            results = self.engine.recognize(batch)
             
-            if confidence < 65:  # 置信度阈值
-                user_info = self.users.get(user_id)
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            recognized = []
+            verified_ids = []
+            best_confidence = None
+            for user_id, confidence, user_info in results:
+                if best_confidence is None or confidence < best_confidence:
+                    best_confidence = confidence
                 if user_info:
-                    # 更新最后验证时间
-                    user_info['last_verified'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    self.save_users()
-                    self.status_label.config(text=f"验证成功: {user_info['name']} (置信度: {confidence:.2f})")
-                    self.last_verify_result = True  # 记录验证结果
-                else:
-                    self.status_label.config(text="验证失败: 未识别")
-                    self.last_verify_result = False
+                    verified_ids.append(user_id)
+                    recognized.append(f"{user_info['name']} (置信度: {confidence:.2f})")
+            
+            # 每帧统一提交结果
+            if recognized:
+                # 更新最后验证时间
+                self.engine.record_verification(verified_ids, now)
+                self.status_label.config(text=f"验证成功: {', '.join(recognized)}")
+                self.last_verify_result = True  # 记录验证结果
+            elif best_confidence is not None and best_confidence < self.engine.threshold:
+                self.status_label.config(text="验证失败: 未识别")
+                self.last_verify_result = False
             else:
-                self.status_label.config(text=f"验证失败: 未识别 (置信度: {confidence:.2f})")
+                self.status_label.config(text=f"验证失败: 未识别 (置信度: {best_confidence:.2f})")
                 self.last_verify_result = False
+            return results
         except Exception as e:
             print(f"验证错误: {e}")
             self.last_verify_result = False
+            return []
             
     def on_user_select(self, event):
         """处理用户选择事件"""
         selection = self.users_listbox.curselection()
         if selection:
             index = selection[0]
-            user_id = list(self.users.keys())[index]
-            user = self.users[user_id]
+            user_id = list(self.engine.users.keys())[index]
+            user = self.engine.users[user_id]
             details = [
                 f"用户ID: {user_id}",
                 f"用户名: {user['name']}",
@@ -605,18 +703,11 @@ class FaceRecognitionSystem:
             
         if messagebox.askyesno("确认", "确定要删除选中的用户吗？"):
             index = selection[0]
-            user_id = list(self.users.keys())[index]
-            del self.users[user_id]
-            self.save_users()
+            user_id = list(self.engine.users.keys())[index]
+            self.engine.remove_user(user_id)
             self.update_users_list()
             self.user_details_label.config(text="")
             
-            # 如果没有用户了，重新训练模型
-            if not self.users:
-                if os.path.exists(self.model_path):
-                    os.remove(self.model_path)
-                self.face_recognizer = cv2.face.LBPHFaceRecognizer_create()
-            
     def rename_selected_user(self):
         """修改选中用户的用户名"""
         selection = self.users_listbox.curselection()
@@ -625,8 +716,8 @@ class FaceRecognitionSystem:
             return
             
         index = selection[0]
-        user_id = list(self.users.keys())[index]
-        user = self.users[user_id]
+        user_id = list(self.engine.users.keys())[index]
+        user = self.engine.users[user_id]
         
         # 创建修改用户名对话框
         dialog = tk.Toplevel(self.window)
@@ -641,8 +732,7 @@ class FaceRecognitionSystem:
         def confirm():
             new_name = new_name_var.get().strip()
             if new_name:
-                user['name'] = new_name
-                self.save_users()
+                self.engine.update_user(user_id, name=new_name)
                 self.update_users_list()
                 dialog.destroy()
             else:
@@ -668,7 +758,7 @@ class FaceRecognitionSystem:
             user_id = int(id_match.group(1))
             
             # 验证用户ID是否存在
-            if user_id not in self.users:
+            if user_id not in self.engine.users:
                 raise ValueError("用户ID不存在")
             
             # 确保摄像头已关闭
@@ -679,26 +769,17 @@ class FaceRecognitionSystem:
             # 设置重新采集模式
             self.current_mode = 'recapture'
             self.current_user_id = user_id
-            self.face_samples = []
+            self.sample_selector = SampleSelector(target=self.sample_target)
+            self.face_samples = self.sample_selector.samples
             
             # 启动摄像头前确保GUI已更新
             self.window.update()
             
-            # 启动摄像头
-            self.cap = cv2.VideoCapture(0)
-            if not self.cap.isOpened():
-                raise ValueError("无法打开摄像头")
-            
-            self.is_running = True
-            self.register_button.config(state=tk.DISABLED)
-            self.verify_button.config(state=tk.DISABLED)
-            self.stop_button.config(state=tk.NORMAL)
-            
-            # 使用新线程处理视频流
-            self.video_thread = threading.Thread(target=self.update_frame, daemon=True)
-            self.video_thread.start()
+            # 与录入、验证使用同一视频源（包括回放和逐帧记录）
+            if not self.start_camera():
+                return
             
-            self.status_label.config(text="状态: 重新采集中 (需要采集20张人脸样本)")
+            self.status_label.config(text=f"状态: 重新采集中 (需要采集{self.sample_target}张人脸样本)")
             
         except Exception as e:
             messagebox.showerror("错误", f"重新采集失败: {str(e)}")
@@ -709,30 +790,16 @@ class FaceRecognitionSystem:
         """完成重新采集流程"""
         try:
             # 确保有足够的样本
-            if len(self.face_samples) < 20:
+            if len(self.face_samples) < self.sample_target:
                 messagebox.showerror("错误", "样本数量不足")
                 return
             
-            # 准备训练数据
-            faces = np.array(self.face_samples)
-            labels = np.array([self.current_user_id] * len(self.face_samples))
-            
-            # 重新创建并训练识别器
-            self.face_recognizer = cv2.face.LBPHFaceRecognizer_create()
-            
-            # 加载现有模型（如果存在）
-            if os.path.exists(self.model_path):
-                self.face_recognizer.read(self.model_path)
-            
-            # 训练模型
-            self.face_recognizer.train(faces, labels)
+            # 用新样本替换该用户的旧样本，其他用户不受影响
+            self.engine.replace_samples(self.current_user_id, self.face_samples)
             
             # 更新用户信息
-            self.users[self.current_user_id]['updated_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # 保存模型和用户数据
-            self.face_recognizer.save(self.model_path)
-            self.save_users()
+            self.engine.update_user(self.current_user_id,
+                                    updated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
             self.update_users_list()
             
             messagebox.showinfo("成功", "人脸重新采集完成！")
@@ -839,14 +906,17 @@ class FaceRecognitionSystem:
 
     def draw_chinese_text(self, frame, text, position, color):
         """使用PIL绘制中文文本"""
+        load_pil()
         # 转换图片为PIL格式
         frame_pil = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
         
         # 创建画布
         draw = ImageDraw.Draw(frame_pil)
         
-        # 使用系统字体
-        fontStyle = self.get_system_font()
+        # 使用系统字体（首次使用时查找并缓存）
+        if self.font is None:
+            self.font = self.get_system_font()
+        fontStyle = self.font
         
         # 绘制文本
         draw.text(
@@ -886,26 +956,36 @@ class FaceRecognitionSystem:
 
     def get_resource_path(self, relative_path):
         """获取资源文件的绝对路径"""
-        if hasattr(sys, '_MEIPASS'):
-            # PyInstaller 创建的临时文件夹
-            base_path = sys._MEIPASS
-        elif 'Contents/Resources' in os.path.abspath(__file__):
-            # py2app 打包后的资源路径
-            base_path = os.path.abspath(os.path.join(
-                os.path.dirname(__file__),
-                '..'  # 回到 Resources 目录
-            ))
-        else:
-            # 开发环境下的路径
-            base_path = os.path.abspath(os.path.dirname(__file__))
-        
-        return os.path.join(base_path, relative_path)
+        return get_resource_path(relative_path)
+
+def load_pil():
+    """首次需要时导入PIL，避免拖慢窗口显示"""
+    global Image, ImageTk, ImageDraw, ImageFont
+    if Image is None:
+        from PIL import Image, ImageTk, ImageDraw, ImageFont
 
 def main():
     """主函数，创建并运行GUI应用"""
+    parser = argparse.ArgumentParser(description="人脸识别系统")
+    parser.add_argument('--replay', help="用录制的视频文件或图片目录代替摄像头")
+    parser.add_argument('--pacing', default='realtime', type=parse_pacing,
+                        help="回放节奏：realtime（原始帧率）、max（尽可能快）或帧率数字")
+    parser.add_argument('--record', help="将每帧的检测决策、识别结果和耗时写入此文件")
+    parser.add_argument('--samples', type=int, default=SAMPLE_TARGET,
+                        help=f"录入时每人采集的样本数（默认{SAMPLE_TARGET}）")
+    args, _ = parser.parse_known_args()  # 忽略打包后系统附加的参数
+
     root = tk.Tk()
-    app = FaceRecognitionSystem(root)
+    app = FaceRecognitionSystem(
+        root,
+        video_source=args.replay if args.replay else 0,
+        pacing=args.pacing if args.replay else None,
+        record_path=args.record,
+        sample_target=args.samples
+    )
     root.mainloop()
+    # 退出前写入尚未保存的验证时间
+    app.engine.flush_verifications()
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
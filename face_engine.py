@@ -0,0 +1,863 @@
+import copy  # 用户数据快照
+import json  # 导入日志解析
+import os  # 文件和目录操作
+import pickle  # 数据序列化
+import sys  # 系统模块
+import threading  # 多线程处理
+import time  # 时间处理
+
+import cv2  # OpenCV库，用于图像处理和人脸识别
+import numpy as np  # 数值计算库
+
+from face_matcher import CentroidMatcher, ShardedMatcher, count_model_labels  # 两阶段人脸匹配器
+from face_preprocess import FacePreprocessor  # 录入和识别共用的人脸预处理
+
+# Haar级联人脸检测器文件
+CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+
+# 加载期间内存中的图库被修改时，锁外重新加载的最多次数（之后在锁内加载）
+RELOAD_ATTEMPTS = 3
+
+
+def get_resource_path(relative_path):
+    """获取资源文件的绝对路径"""
+    if hasattr(sys, '_MEIPASS'):
+        # PyInstaller 创建的临时文件夹
+        base_path = sys._MEIPASS
+    elif 'Contents/Resources' in os.path.abspath(__file__):
+        # py2app 打包后的资源路径
+        base_path = os.path.abspath(os.path.join(
+            os.path.dirname(__file__),
+            '..'  # 回到 Resources 目录
+        ))
+    else:
+        # 开发环境下的路径
+        base_path = os.path.abspath(os.path.dirname(__file__))
+
+    return os.path.join(base_path, relative_path)
+
+
+def face_result(box, user_id, confidence, user_info):
+    """
+    将一张人脸的识别结果整理为可序列化的字典
+    Args:
+        box: 人脸矩形 (x, y, w, h)
+        user_id, confidence, user_info: recognize() 返回的结果
+    Returns:
+        dict: 包含 box、user_id、name、confidence 的结果
+    """
+    x, y, w, h = box
+    return {
+        'box': [int(x), int(y), int(w), int(h)],
+        'user_id': int(user_id) if user_info else None,
+        'name': user_info['name'] if user_info else None,
+        'confidence': float(confidence) if np.isfinite(confidence) else None,
+    }
+
+
+class FaceEngine:
+    """
+    无界面的人脸检测与识别引擎
+    负责加载检测器、识别模型和用户数据，GUI、命令行等入口共用
+    只依赖OpenCV和numpy，不会导入tkinter或PIL
+    """
+    def __init__(self, data_dir=None, model_path=None, threshold=65, top_k=5, shards=None):
+        """
+        初始化引擎（不加载任何文件，调用 load() 后才可使用）
+        Args:
+            data_dir: 用户数据目录，默认为资源目录下的 face_data
+            model_path: 模型文件路径，默认为资源目录下的 face_model.yml
+            threshold: 识别置信度阈值，距离小于此值视为识别成功
+            top_k: 匹配器第一阶段保留的候选用户数
+            shards: 图库分片数，None 时按磁盘上已有的分片文件自动确定（没有则不分片）
+        """
+        self.data_dir = data_dir or get_resource_path("face_data")
+        self.model_path = model_path or get_resource_path("face_model.yml")
+        self.threshold = threshold
+        self.top_k = top_k
+        self.shards = shards
+        self.lock = threading.RLock()
+        self.local = threading.local()  # 每个线程各自的人脸检测器
+        self.matcher = CentroidMatcher(top_k=top_k)
+        self.preprocessor = FacePreprocessor()
+        self.users = {}
+        self.saved_users = {}  # 最近一次加载或保存时的用户数据，用于合并其他终端的修改
+        self.revision = 0  # 内存中的用户数据和图库的修改次数
+        self.verified = {}  # 尚未写入文件的验证时间：用户ID -> 时间
+        self.verified_saved = 0.0  # 上次写入验证时间的时刻
+        self.verification_save_interval = 30.0  # 验证时间最多每隔多少秒写入一次文件（秒）
+        self.loaded = False
+        self.load_time = None  # 加载耗时（秒）
+        self.generation = None  # 已加载的模型和用户文件版本
+        self.journal_ids = set()  # 导入日志中已分配的用户ID
+        self.journal_offset = 0  # 导入日志已读取的字节数
+
+    @property
+    def users_file(self):
+        """用户数据文件路径"""
+        return os.path.join(self.data_dir, "users.pkl")
+
+    @property
+    def preprocess_file(self):
+        """预处理配置文件路径"""
+        return os.path.join(self.data_dir, "preprocess.json")
+
+    @property
+    def journal_path(self):
+        """批量导入日志路径（导入完成后删除）"""
+        return os.path.join(self.data_dir, 'import_journal.jsonl')
+
+    @property
+    def samples_dir(self):
+        """人脸样本目录（录入和批量导入时保存的裁剪人脸）"""
+        return os.path.join(self.data_dir, 'samples')
+
+    def sample_path(self, user_id):
+        """用户样本文件路径"""
+        return os.path.join(self.samples_dir, f"{user_id}.npz")
+
+    def load(self):
+        """
+        加载检测器、模型和用户数据
+        Raises:
+            AttributeError: 未安装OpenCV contrib模块
+        """
+        start = time.perf_counter()
+        # 加载人脸检测器（Haar级联分类器）
+        self.cascade()  # 其他线程第一次检测时各自创建
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.reload()
+        self.loaded = True
+        self.load_time = time.perf_counter() - start
+
+    @property
+    def sharded(self):
+        """是否使用分片图库"""
+        return (self.shards or 1) > 1
+
+    def shard_path(self, index):
+        """分片模型文件路径，如 face_model.shard0.yml"""
+        root, ext = os.path.splitext(self.model_path)
+        return f"{root}.shard{index}{ext}"
+
+    def existing_shards(self):
+        """返回磁盘上已有的分片文件数量"""
+        count = 0
+        while os.path.exists(self.shard_path(count)):
+            count += 1
+        return count
+
+    def model_files(self):
+        """当前使用的所有模型文件"""
+        if self.sharded:
+            return [self.shard_path(i) for i in range(self.shards)]
+        return [self.model_path]
+
+    def watched_files(self):
+        """模型热加载时检查版本的所有文件"""
+        return self.model_files() + [self.users_file, self.preprocess_file]
+
+    def file_generation(self):
+        """
+        返回模型、用户数据和预处理配置文件的当前版本（修改时间和大小），
+        用于判断磁盘上是否有新模型
+        """
+        generation = []
+        for path in self.watched_files():
+            try:
+                stat = os.stat(path)
+                generation.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                generation.append(None)
+        return tuple(generation)
+
+    def reload(self):
+        """
+        从磁盘加载模型和用户数据，完成后一次性替换正在使用的对象
+        加载期间识别继续使用旧模型；替换后旧模型不再被引用，内存随即释放。
+        LBPH识别器只用于读取模型文件，样本导入匹配器后即丢弃，图库在内存中只保留一份。
+        加载在锁外进行，期间本终端若录入或保存了数据，丢弃加载结果重新加载，不会覆盖刚录入的用户
+        Raises:
+            AttributeError: 未安装OpenCV contrib模块
+        """
+        if self.shards is None:
+            self.shards = self.existing_shards() or 1
+        if self.sharded:
+            self.reload_shards()
+            return
+
+        shard_files = [self.shard_path(i) for i in range(self.existing_shards())]
+        if shard_files:
+            self.merge_shards(shard_files)
+            return
+
+        def load():
+            generation = self.file_generation()
+            # 创建LBPH人脸识别器
+            face_recognizer = cv2.face.LBPHFaceRecognizer_create()
+            users = self.load_users()
+            preprocessor = FacePreprocessor.load(self.preprocess_file)
+            if os.path.exists(self.model_path):
+                face_recognizer.read(self.model_path)  # 如果存在模型文件则加载
+
+            # 用模型中的样本构建两阶段匹配器（忽略已删除用户的样本）
+            matcher = CentroidMatcher(top_k=self.top_k)
+            matcher.load_from_recognizer(face_recognizer, users)
+            return lambda: self.install(users, matcher, preprocessor, generation)
+
+        self.reload_consistently(load)
+
+    def reload_consistently(self, load):
+        """
+        在锁外加载，在锁内替换
+        替换前检查加载期间内存中的图库（revision）和本终端写入的文件版本（generation）
+        是否变化，变化时丢弃加载结果重试；多次重试仍不成功时持有锁完成加载
+        Args:
+            load: 读取文件的函数，返回在锁内执行的替换函数
+        """
+        for _ in range(RELOAD_ATTEMPTS):
+            revision, generation = self.revision, self.generation
+            install = load()
+            with self.lock:
+                if self.revision == revision and self.generation == generation:
+                    install()
+                    return
+        with self.lock:
+            load()()
+
+    def install(self, users, matcher, preprocessor, generation):
+        """
+        替换正在使用的用户数据、匹配器和预处理配置（调用方持有锁）
+        尚未写入文件的验证时间会保留到新的用户数据中
+        """
+        self.saved_users = copy.deepcopy(users)
+        self.apply_verifications(users)
+        # 先替换用户数据，再替换匹配器，识别时不会查到不存在的用户
+        self.users = users
+        self.matcher = matcher
+        self.preprocessor = preprocessor
+        self.generation = generation
+
+    def reload_users(self):
+        """
+        只重新读取用户数据（其他终端只修改了用户数据文件，如保存了验证时间），
+        模型不变，不重新加载图库
+        """
+        def load():
+            generation = self.file_generation()
+            users = self.load_users()
+
+            def install():
+                index = self.watched_files().index(self.users_file)
+                current = list(self.generation)
+                current[index] = generation[index]
+                self.saved_users = copy.deepcopy(users)
+                self.apply_verifications(users)
+                self.users = users
+                self.generation = tuple(current)
+            return install
+
+        self.reload_consistently(load)
+
+    def reload_shards(self):
+        """
+        加载分片图库，每个分片从各自的模型文件读取
+        首次启用分片或分片数与磁盘上的分片文件数不同时，把所有用户按ID哈希重新分配到
+        各分片并重写分片文件，删除多余的分片文件。
+        分片文件在锁外读取，只有重写分片文件和替换图库在锁内进行，不会阻塞其他线程保存数据
+        """
+        def load():
+            shard_files = [self.shard_path(i) for i in range(self.existing_shards())]
+            generation = self.file_generation()
+            users = self.load_users()
+            preprocessor = FacePreprocessor.load(self.preprocess_file)
+            matcher = ShardedMatcher(self.shards, top_k=self.top_k)
+            if len(shard_files) == self.shards:
+                for shard, path in zip(matcher.shards, shard_files):
+                    face_recognizer = cv2.face.LBPHFaceRecognizer_create()
+                    face_recognizer.read(path)
+                    shard.load_from_recognizer(face_recognizer, users)
+                return lambda: self.install(users, matcher, preprocessor, generation)
+
+            sources = shard_files or [path for path in [self.model_path] if os.path.exists(path)]
+            for user_id, samples in self.read_models(sources, users):
+                matcher.add(user_id, samples)
+
+            def install():
+                if sources:
+                    for shard, path in zip(matcher.shards, self.model_files()):
+                        self.save_model(shard.save_model, path)
+                    for path in shard_files[self.shards:]:
+                        os.remove(path)
+                self.install(users, matcher, preprocessor, self.file_generation())
+            return install
+
+        self.reload_consistently(load)
+
+    def merge_shards(self, shard_files):
+        """
+        不再使用分片时，把所有分片文件合并为单一模型文件并删除分片文件
+        分片文件在锁外读取，写出合并后的模型和替换图库在锁内进行
+        Args:
+            shard_files: 磁盘上的分片文件
+        """
+        def load():
+            users = self.load_users()
+            preprocessor = FacePreprocessor.load(self.preprocess_file)
+            matcher = CentroidMatcher(top_k=self.top_k)
+            for user_id, samples in self.read_models(shard_files, users):
+                matcher.add(user_id, samples)
+
+            def install():
+                if len(matcher):
+                    self.save_model(matcher.save_model)
+                elif os.path.exists(self.model_path):
+                    os.remove(self.model_path)
+                for path in shard_files:
+                    os.remove(path)
+                self.install(users, matcher, preprocessor, self.file_generation())
+            return install
+
+        self.reload_consistently(load)
+
+    def read_models(self, paths, users):
+        """
+        逐个读取模型文件中的样本直方图
+        Args:
+            paths: 模型文件路径列表
+            users: 用户数据字典，只读取这些用户的样本
+        Yields:
+            tuple: (用户ID, 样本直方图 (n, D))
+        """
+        for path in paths:
+            face_recognizer = cv2.face.LBPHFaceRecognizer_create()
+            face_recognizer.read(path)
+            loaded = CentroidMatcher(top_k=self.top_k)
+            loaded.load_from_recognizer(face_recognizer, users)
+            for user_id in loaded.user_ids():
+                yield user_id, loaded.samples(user_id)
+
+    def save_shard(self, user_id):
+        """保存用户所在的分片（由直方图直接写出，不影响其他分片）"""
+        index = self.matcher.shard_index(user_id)
+        self.save_model(self.matcher.shards[index].save_model, self.shard_path(index))
+
+    def reload_if_changed(self):
+        """
+        磁盘上的模型或用户数据有新版本时重新加载
+        Returns:
+            bool: 是否进行了重新加载
+        """
+        current = self.file_generation()
+        if current == self.generation:
+            return False
+        index = self.watched_files().index(self.users_file)
+        if self.generation is not None and len(current) == len(self.generation) and all(
+                a == b for i, (a, b) in enumerate(zip(current, self.generation)) if i != index):
+            self.reload_users()
+        else:
+            self.reload()
+        return True
+
+    def next_user_id(self):
+        """
+        分配新用户ID（现有用户、图库和未完成的批量导入中最大的ID加1）
+        录入和批量导入都由此分配ID，不会与导入中的人员共用同一个样本文件
+        Returns:
+            int: 新用户ID
+        """
+        with self.lock:
+            used_ids = list(self.users) + list(self.matcher.user_ids()) + list(self.journal_user_ids())
+            return max(used_ids, default=-1) + 1
+
+    def read_journal(self):
+        """
+        读取未完成的批量导入日志
+        Returns:
+            dict: 人员 key -> 记录（key、user_id、samples、failed_images）
+        """
+        done = {}
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # 最后一行可能只写了一半
+                    done[record['key']] = record
+        return done
+
+    def journal_user_ids(self):
+        """
+        导入日志中已分配的用户ID
+        日志只会追加，每次只读取上次之后新写入的完整行
+        Returns:
+            set: 用户ID集合，没有未完成的导入时为空
+        """
+        with self.lock:
+            try:
+                size = os.path.getsize(self.journal_path)
+            except FileNotFoundError:
+                size = 0
+            if size < self.journal_offset or size == 0:
+                # 导入已完成（日志被删除）或开始了新的导入
+                self.journal_ids = set()
+                self.journal_offset = 0
+            if size > self.journal_offset:
+                with open(self.journal_path, 'rb') as f:
+                    f.seek(self.journal_offset)
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break  # 正在写入的行
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            break
+                        self.journal_offset += len(line)
+                        if record.get('user_id') is not None:
+                            self.journal_ids.add(record['user_id'])
+            return self.journal_ids
+
+    def load_users(self):
+        """
+        从文件加载用户数据
+        Returns:
+            dict: 用户数据字典，如果文件不存在则返回空字典
+        """
+        if os.path.exists(self.users_file):
+            with open(self.users_file, 'rb') as f:
+                return pickle.load(f)
+        return {}
+
+    def save_users(self, merge=True):
+        """
+        保存用户数据到文件
+        文件在加载后被其他终端修改过时，先读入磁盘上的最新内容，只合并本终端自上次
+        加载或保存以来的修改（新增、更新和删除的用户），不会覆盖其他终端录入或删除的用户
+        Args:
+            merge: 为 False 时直接用内存中的用户数据覆盖文件（如从备份恢复）
+        """
+        with self.lock:
+            self.verified = {}
+            self.verified_saved = time.monotonic()
+            users = self.users
+            if merge and self.users_changed_on_disk():
+                users = self.load_users()
+                for user_id in self.saved_users.keys() - self.users.keys():
+                    users.pop(user_id, None)
+                for user_id, user_info in self.users.items():
+                    if user_id not in self.saved_users:
+                        users[user_id] = user_info
+                    elif user_id in users and user_info != self.saved_users[user_id]:
+                        # 其他终端已删除的用户不会因本地更新（如验证时间）而恢复
+                        users[user_id] = user_info
+            temp_file = self.users_file + '.tmp'
+            with open(temp_file, 'wb') as f:
+                pickle.dump(users, f)
+            os.replace(temp_file, self.users_file)
+            self.mark_saved(self.users_file)
+            self.users = users
+            self.saved_users = copy.deepcopy(users)
+
+    def register_user(self, user_info, faces):
+        """
+        注册新用户：分配ID、保存样本、模型和用户数据，整个过程持有锁，
+        期间完成的重新加载会被丢弃重试，新用户不会丢失
+        Args:
+            user_info: 用户信息字典
+            faces: 100x100灰度人脸样本列表
+        Returns:
+            int: 新用户ID
+        """
+        with self.lock:
+            self.revision += 1
+            user_id = self.next_user_id()
+            self.users[user_id] = user_info
+            self.enroll(user_id, faces)
+            self.save_users()
+            return user_id
+
+    def update_user(self, user_id, **fields):
+        """
+        更新用户信息并保存
+        Args:
+            user_id: 用户ID
+            fields: 要更新的字段，如 updated_at
+        """
+        with self.lock:
+            self.revision += 1
+            self.users[user_id].update(fields)
+            self.save_users()
+
+    def record_verification(self, user_ids, when):
+        """
+        记录用户的最后验证时间
+        内存中立即更新，写入文件最多每隔 verification_save_interval 秒一次：
+        用户数据文件每次变化都会让其他终端重新读取，验证终端不能每帧都写
+        Args:
+            user_ids: 本帧识别成功的用户ID
+            when: 验证时间字符串
+        """
+        with self.lock:
+            for user_id in user_ids:
+                if user_id in self.users:
+                    self.verified[user_id] = when
+            self.apply_verifications(self.users)
+            if self.verified and time.monotonic() - self.verified_saved >= self.verification_save_interval:
+                self.save_users()
+
+    def flush_verifications(self):
+        """立即写入尚未保存的验证时间（停止验证或退出时调用）"""
+        with self.lock:
+            if self.verified:
+                self.save_users()
+
+    def apply_verifications(self, users):
+        """把尚未写入文件的验证时间更新到用户数据中"""
+        for user_id, when in self.verified.items():
+            if user_id in users:
+                users[user_id]['last_verified'] = when
+
+    def users_changed_on_disk(self):
+        """用户数据文件在最近一次加载或保存后是否被其他终端修改过"""
+        if self.generation is None:
+            return os.path.exists(self.users_file)
+        index = self.watched_files().index(self.users_file)
+        return self.file_generation()[index] != self.generation[index]
+
+    def save_model(self, save, path=None):
+        """
+        先写入临时文件再原子替换模型文件，其他终端不会读到写了一半的模型
+        Args:
+            save: 接受文件路径的保存函数，如 matcher.save_model
+            path: 目标文件，默认为模型文件
+        """
+        path = path or self.model_path
+        with self.lock:
+            root, ext = os.path.splitext(path)
+            temp_path = f"{root}.tmp{ext}"  # 保留扩展名，OpenCV据此选择文件格式
+            save(temp_path)
+            os.replace(temp_path, path)
+            self.mark_saved(path)
+
+    def mark_saved(self, path):
+        """
+        记录自身写入后的文件版本，避免监视器把自己的写入当作新模型
+        只更新本次写入的文件，另一个文件若被外部修改仍会触发重新加载
+        Args:
+            path: 刚写入（或删除）的文件
+        """
+        current = self.file_generation()
+        if self.generation is None:
+            self.generation = current
+            return
+        files = self.watched_files()
+        if path not in files or len(files) != len(self.generation):
+            return
+        index = files.index(path)
+        generation = list(self.generation)
+        generation[index] = current[index]
+        self.generation = tuple(generation)
+
+    def cascade(self):
+        """当前线程的人脸检测器（CascadeClassifier 不能被多个线程同时使用）"""
+        cascade = getattr(self.local, 'face_cascade', None)
+        if cascade is None:
+            cascade = cv2.CascadeClassifier(CASCADE_PATH)
+            self.local.face_cascade = cascade
+        return cascade
+
+    def detect(self, gray, region=None):
+        """
+        检测灰度图像中的人脸
+        Args:
+            gray: 灰度图像
+            region: 可选，视频源的 DetectionRegion，限定检测区域和人脸尺寸范围
+        Returns:
+            人脸矩形 (x, y, w, h) 序列
+        """
+        if region is None:
+            return self.cascade().detectMultiScale(
+                gray,
+                scaleFactor=1.1,
+                minNeighbors=5,
+                minSize=(60, 60)
+            )
+        crop, x0, y0 = region.crop(gray)
+        if crop.size == 0:
+            return region.accept((), x0, y0)
+        min_size, max_size = region.size_range()
+        faces = self.cascade().detectMultiScale(
+            crop,
+            scaleFactor=1.1,
+            minNeighbors=5,
+            minSize=min_size,
+            maxSize=max_size
+        )
+        return region.accept(faces, x0, y0)
+
+    def recognize(self, faces):
+        """
+        批量识别已缩放为100x100的人脸
+        Args:
+            faces: 形状为 (N, 100, 100) 的灰度人脸数组
+        Returns:
+            list: 每张人脸的 (用户ID, 置信度, 用户信息)，未识别时用户信息为None
+        """
+        # 取快照，识别过程中模型被热替换也不受影响
+        matcher, users, preprocessor = self.matcher, self.users, self.preprocessor
+        results = []
+        for user_id, confidence in matcher.predict_batch(preprocessor.apply(faces)):
+            user_info = users.get(user_id) if confidence < self.threshold else None
+            results.append((user_id, confidence, user_info))
+        return results
+
+    def histograms(self, faces):
+        """
+        预处理后计算人脸样本直方图（与识别时的处理完全一致）
+        Args:
+            faces: 形状为 (N, 100, 100) 的灰度人脸数组
+        Returns:
+            numpy.ndarray: 形状为 (N, D) 的直方图
+        """
+        return self.matcher.histograms(self.preprocessor.apply(faces))
+
+    def analyze(self, gray, region=None):
+        """
+        检测并识别灰度图像中的所有人脸
+        Args:
+            gray: 灰度图像
+            region: 可选，视频源的 DetectionRegion
+        Returns:
+            list: 每张人脸的结果字典，见 face_result()
+        """
+        faces = self.detect(gray, region)
+        if len(faces) == 0:
+            return []
+        rois = np.empty((len(faces), 100, 100), dtype=np.uint8)
+        for i, (x, y, w, h) in enumerate(faces):
+            cv2.resize(gray[y:y+h, x:x+w], (100, 100), dst=rois[i])
+        return [face_result(box, *result) for box, result in zip(faces, self.recognize(rois))]
+
+    def enroll(self, user_id, faces):
+        """
+        为用户追加人脸样本并保存模型和原始样本
+        Args:
+            user_id: 用户ID
+            faces: 100x100灰度人脸样本列表
+        """
+        with self.lock:
+            self.revision += 1
+            if user_id not in self.matcher:
+                # 新用户：覆盖同名的残留样本文件，不会继承其他人的样本
+                self.save_samples(user_id, faces)
+            elif os.path.exists(self.sample_path(user_id)):
+                # 之前录入时没有保存原始样本的用户不写样本文件，避免只用部分样本重建
+                self.save_samples(user_id, faces, append=True)
+            self.matcher.add(user_id, self.histograms(np.asarray(faces)))
+            if self.sharded:
+                # 只修改并保存用户所在的分片
+                self.save_shard(user_id)
+                return
+            # 由匹配器直接写出模型文件，不需要LBPH重新训练
+            self.save_model(self.matcher.save_model)
+
+    def import_users(self, entries):
+        """
+        批量添加用户，所有样本合并后只写出一次模型和用户数据
+        entries 可以是生成器：每个用户到达时立即加入图库，直方图不会在内存中另存一份
+        Args:
+            entries: (user_id, user_info, histograms) 序列，histograms 为 (n, D) 样本直方图
+        """
+        user_ids = []
+        for user_id, user_info, histograms in entries:
+            with self.lock:
+                self.revision += 1
+                self.users[user_id] = user_info
+                self.matcher.add(user_id, histograms)
+            user_ids.append(user_id)
+        if not user_ids:
+            return
+        with self.lock:
+            self.revision += 1
+            if self.sharded:
+                # 每个受影响的分片只保存一次
+                saved = set()
+                for user_id in user_ids:
+                    index = self.matcher.shard_index(user_id)
+                    if index not in saved:
+                        saved.add(index)
+                        self.save_shard(user_id)
+            else:
+                # 由匹配器直接写出模型文件，不需要LBPH重新训练
+                self.save_model(self.matcher.save_model)
+            self.save_users()
+
+    def replace_samples(self, user_id, faces):
+        """
+        用新样本替换用户的全部样本（重新采集），其他用户不受影响
+        Args:
+            user_id: 用户ID
+            faces: 100x100灰度人脸样本列表
+        """
+        with self.lock:
+            self.revision += 1
+            self.save_samples(user_id, faces)
+            self.matcher.replace(user_id, self.histograms(np.asarray(faces)))
+            if self.sharded:
+                self.save_shard(user_id)
+                return
+            # 直接由匹配器写出模型文件
+            self.save_model(self.matcher.save_model)
+
+    def save_samples(self, user_id, faces, append=False):
+        """
+        保存用户的原始人脸样本（未经预处理），更换预处理配置时据此重建直方图
+        Args:
+            user_id: 用户ID
+            faces: 100x100灰度人脸样本数组
+            append: 是否追加到已保存的样本之后，默认替换
+        """
+        faces = np.asarray(faces, dtype=np.uint8)
+        path = self.sample_path(user_id)
+        with self.lock:
+            if append and os.path.exists(path):
+                with np.load(path) as data:
+                    faces = np.concatenate([data['faces'], faces])
+            os.makedirs(self.samples_dir, exist_ok=True)
+            temp_path = os.path.join(self.samples_dir, f"{user_id}.tmp.npz")
+            np.savez_compressed(temp_path, faces=faces)
+            os.replace(temp_path, path)
+
+    def remove_user(self, user_id):
+        """
+        删除用户并保存用户数据
+        Args:
+            user_id: 用户ID
+        """
+        with self.lock:
+            self.revision += 1
+            del self.users[user_id]
+            self.matcher.remove(user_id)
+            self.save_users()
+            if os.path.exists(self.sample_path(user_id)):
+                os.remove(self.sample_path(user_id))
+
+            if self.sharded:
+                # 只重建该用户所在的分片，彻底移除其样本
+                self.save_shard(user_id)
+                return
+
+            if self.users:
+                # 由匹配器重写模型文件，彻底移除其样本
+                self.save_model(self.matcher.save_model)
+            elif os.path.exists(self.model_path):
+                # 没有用户了，删除模型文件
+                os.remove(self.model_path)
+                self.mark_saved(self.model_path)
+
+    def set_preprocessing(self, preprocessor):
+        """
+        更换预处理配置并保存
+        保存了原始样本的用户（录入、重新采集或批量导入时保存）会按新配置重新计算直方图，
+        没有原始样本的早期用户仍是按旧配置录入的，需要重新采集
+        Args:
+            preprocessor: 新的 FacePreprocessor
+        Returns:
+            list: 无法重建、需要重新采集的用户ID
+        """
+        with self.lock:
+            self.revision += 1
+            temp_file = self.preprocess_file + '.tmp'
+            preprocessor.save(temp_file)
+            os.replace(temp_file, self.preprocess_file)
+            self.mark_saved(self.preprocess_file)
+            self.preprocessor = preprocessor
+
+            stale = []
+            for user_id in self.matcher.user_ids():
+                if not os.path.exists(self.sample_path(user_id)):
+                    stale.append(user_id)
+                    continue
+                with np.load(self.sample_path(user_id)) as data:
+                    self.matcher.replace(user_id, self.histograms(data['faces']))
+            if len(stale) < len(self.matcher):
+                self.compact()
+        return stale
+
+    def compact(self):
+        """
+        由内存中的图库重写模型文件，去掉已删除用户残留在模型中的样本，
+        并删除已不存在用户的样本文件（未完成的批量导入已保存的样本除外）
+        Returns:
+            tuple: (移除的模型样本数, 删除的样本文件数)
+        """
+        with self.lock:
+            paths = [path for path in self.model_files() if os.path.exists(path)]
+            before = sum(count_model_labels(path) for path in paths)
+            if self.sharded:
+                for shard, path in zip(self.matcher.shards, self.model_files()):
+                    self.save_model(shard.save_model, path)
+            elif self.users:
+                self.save_model(self.matcher.save_model)
+            elif os.path.exists(self.model_path):
+                os.remove(self.model_path)
+                self.mark_saved(self.model_path)
+            after = sum(len(self.matcher.samples(user_id)) for user_id in self.matcher.user_ids())
+
+            removed_files = 0
+            if os.path.isdir(self.samples_dir):
+                # 导入日志中的用户还未写入用户数据，其样本用于断点续传
+                keep = set(self.users) | self.journal_user_ids()
+                for name in os.listdir(self.samples_dir):
+                    stem, ext = os.path.splitext(name)
+                    if ext == '.npz' and stem.isdigit() and int(stem) not in keep:
+                        os.remove(os.path.join(self.samples_dir, name))
+                        removed_files += 1
+        return before - after, removed_files
+
+
+class ModelWatcher:
+    """
+    模型文件监视器
+    后台定期检查模型和用户文件版本，发现新版本时在后台加载并原子替换，
+    正在进行的识别不会暂停
+    """
+    def __init__(self, engine, interval=2.0, on_reload=None):
+        """
+        初始化监视器
+        Args:
+            engine: 已加载的 FaceEngine 对象
+            interval: 检查间隔（秒）
+            on_reload: 可选，重新加载后调用的回调函数（在监视线程中调用）
+        """
+        self.engine = engine
+        self.interval = interval
+        self.on_reload = on_reload
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """启动监视线程"""
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止监视线程"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        """监视循环"""
+        while not self.stopped.wait(self.interval):
+            try:
+                if self.engine.reload_if_changed():
+                    print(f"已加载新模型: {len(self.engine.users)} 个用户")
+                    if self.on_reload is not None:
+                        self.on_reload()
+            except Exception as e:
+                # 文件可能正在被写入，下次检查时重试
+                print(f"模型重新加载失败: {e}")
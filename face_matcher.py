@@ -0,0 +1,487 @@
+import threading  # 多线程处理
+from concurrent.futures import ThreadPoolExecutor  # 并行查询分片
+
+import cv2  # OpenCV库，用于读写模型文件
+import numpy as np  # 数值计算库
+
+
+# LBPH默认参数，与 cv2.face.LBPHFaceRecognizer_create() 保持一致
+LBP_RADIUS = 1
+LBP_NEIGHBORS = 8
+LBP_GRID_X = 8
+LBP_GRID_Y = 8
+
+
+def lbp_histogram(face, radius=LBP_RADIUS, neighbors=LBP_NEIGHBORS,
+                  grid_x=LBP_GRID_X, grid_y=LBP_GRID_Y):
+    """
+    计算人脸图像的LBP空间直方图
+    与OpenCV LBPH识别器内部的计算方式逐位一致，可直接与模型中的直方图比较
+    Args:
+        face: 灰度人脸图像（通常为100x100）
+        radius: LBP半径
+        neighbors: LBP采样点数
+        grid_x: 水平方向网格数
+        grid_y: 垂直方向网格数
+    Returns:
+        numpy.ndarray: float32一维直方图，长度为 grid_x * grid_y * 2^neighbors
+    """
+    return lbp_histograms(np.asarray(face)[None], radius, neighbors, grid_x, grid_y)[0]
+
+
+def lbp_histograms(faces, radius=LBP_RADIUS, neighbors=LBP_NEIGHBORS,
+                   grid_x=LBP_GRID_X, grid_y=LBP_GRID_Y):
+    """
+    批量计算LBP空间直方图，所有人脸一次完成向量化计算
+    Args:
+        faces: 形状为 (N, H, W) 的灰度人脸数组
+        radius, neighbors, grid_x, grid_y: LBP参数
+    Returns:
+        numpy.ndarray: 形状为 (N, D) 的float32直方图
+    """
+    src = np.asarray(faces, dtype=np.float32)
+    count, rows, cols = src.shape
+    height, width = rows - 2 * radius, cols - 2 * radius
+    center = src[:, radius:radius + height, radius:radius + width]
+    codes = np.zeros((count, height, width), dtype=np.int32)
+    eps = np.finfo(np.float32).eps
+
+    for n in range(neighbors):
+        # 圆周采样点及双线性插值权重
+        x = np.float32(radius * np.cos(2.0 * np.pi * n / neighbors))
+        y = np.float32(-radius * np.sin(2.0 * np.pi * n / neighbors))
+        fx, fy = int(np.floor(x)), int(np.floor(y))
+        cx, cy = int(np.ceil(x)), int(np.ceil(y))
+        tx, ty = np.float32(x - fx), np.float32(y - fy)
+        w1 = (1 - tx) * (1 - ty)
+        w2 = tx * (1 - ty)
+        w3 = (1 - tx) * ty
+        w4 = tx * ty
+
+        def shifted(dy, dx):
+            return src[:, radius + dy:radius + dy + height, radius + dx:radius + dx + width]
+
+        t = (w1 * shifted(fy, fx) + w2 * shifted(fy, cx)
+             + w3 * shifted(cy, fx) + w4 * shifted(cy, cx))
+        bit = (t > center) | (np.abs(t - center) < eps)
+        codes |= bit.astype(np.int32) << n
+
+    # 按网格切分后一次性统计所有人脸、所有单元的直方图
+    bins = 1 << neighbors
+    cells_per_face = grid_y * grid_x
+    cell_h, cell_w = height // grid_y, width // grid_x
+    cells = codes[:, :grid_y * cell_h, :grid_x * cell_w]
+    cells = cells.reshape(count, grid_y, cell_h, grid_x, cell_w).transpose(0, 1, 3, 2, 4)
+    cells = cells.reshape(count * cells_per_face, cell_h * cell_w)
+    offsets = (np.arange(count * cells_per_face) * bins)[:, None]
+    hist = np.bincount((cells + offsets).ravel(), minlength=count * cells_per_face * bins)
+    hist = hist.reshape(count, cells_per_face * bins)
+    return hist.astype(np.float32) / np.float32(cell_h * cell_w)
+
+
+def chi_square_distances(probes, gallery, gallery_sums=None, chunk_elements=1 << 22):
+    """
+    计算卡方距离（与 HISTCMP_CHISQR_ALT 相同，即LBPH的置信度）
+    LBP直方图较稀疏：探针为0的维度贡献恰为候选直方图本身，
+    因此只需在探针的非零维度上计算，其余部分由行和补上
+    Args:
+        probes: 形状为 (P, D) 的待比较直方图
+        gallery: 形状为 (G, D) 的候选直方图
+        gallery_sums: 可选，gallery 每行之和，可预先计算以复用
+        chunk_elements: 每次计算的最大元素数，用于限制临时内存
+    Returns:
+        numpy.ndarray: 形状为 (P, G) 的距离矩阵
+    """
+    probes = np.atleast_2d(probes)
+    gallery = np.atleast_2d(gallery)
+    result = np.empty((probes.shape[0], gallery.shape[0]), dtype=np.float64)
+    if gallery.shape[0] == 0:
+        return result
+    if gallery_sums is None:
+        gallery_sums = gallery.sum(axis=1, dtype=np.float64)
+    for i, probe in enumerate(probes):
+        nonzero = np.flatnonzero(probe)
+        values = probe[nonzero]
+        step = max(1, chunk_elements // max(1, len(nonzero)))
+        for start in range(0, gallery.shape[0], step):
+            block = gallery[start:start + step, nonzero]
+            diff = block - values
+            terms = diff * diff / (block + values)
+            result[i, start:start + step] = 2.0 * (
+                terms.sum(axis=1, dtype=np.float64)
+                - block.sum(axis=1, dtype=np.float64)
+                + gallery_sums[start:start + step]
+            )
+    return result
+
+
+def count_model_labels(path):
+    """
+    统计LBPH模型文件中的样本数
+    Args:
+        path: 模型文件路径
+    Returns:
+        int: 样本数，文件不存在时为0
+    """
+    fs = cv2.FileStorage(path, cv2.FILE_STORAGE_READ)
+    try:
+        if not fs.isOpened():
+            return 0
+        labels = fs.getNode('opencv_lbphfaces').getNode('labels').mat()
+        return 0 if labels is None else len(labels)
+    finally:
+        fs.release()
+
+
+class ModelWriter:
+    """
+    流式写出LBPH模型文件（与 LBPHFaceRecognizer.save 格式相同）
+    样本直方图逐个用户写入，内存中只保留标签
+    """
+    def __init__(self, path, radius=LBP_RADIUS, neighbors=LBP_NEIGHBORS,
+                 grid_x=LBP_GRID_X, grid_y=LBP_GRID_Y):
+        """
+        创建模型文件并写入LBP参数
+        Args:
+            path: 模型文件路径
+            radius, neighbors, grid_x, grid_y: LBP参数
+        """
+        self.fs = cv2.FileStorage(path, cv2.FILE_STORAGE_WRITE)
+        self.fs.startWriteStruct('opencv_lbphfaces', cv2.FILE_NODE_MAP)
+        self.fs.write('threshold', float(np.finfo(np.float64).max))
+        self.fs.write('radius', radius)
+        self.fs.write('neighbors', neighbors)
+        self.fs.write('grid_x', grid_x)
+        self.fs.write('grid_y', grid_y)
+        self.fs.startWriteStruct('histograms', cv2.FILE_NODE_SEQ)
+        self.labels = []
+
+    def write(self, user_id, histograms):
+        """
+        写入一个用户的样本直方图
+        Args:
+            user_id: 用户ID
+            histograms: 形状为 (n, D) 的直方图
+        """
+        for hist in histograms:
+            self.fs.write('', np.asarray(hist, dtype=np.float32).reshape(1, -1))
+            self.labels.append(user_id)
+
+    def close(self):
+        """写入标签并关闭文件"""
+        if self.fs is None:
+            return
+        try:
+            self.fs.endWriteStruct()
+            self.fs.write('labels', np.array(self.labels, dtype=np.int32).reshape(-1, 1))
+            self.fs.startWriteStruct('labelsInfo', cv2.FILE_NODE_SEQ)
+            self.fs.endWriteStruct()
+            self.fs.endWriteStruct()
+        finally:
+            self.fs.release()
+            self.fs = None
+
+
+class CentroidMatcher:
+    """
+    两阶段人脸匹配器
+    第一阶段与每个用户的平均直方图（质心）比较，筛选出最相近的K个用户；
+    第二阶段只与这K个用户的样本逐一精确比较
+    """
+    def __init__(self, top_k=5, radius=LBP_RADIUS, neighbors=LBP_NEIGHBORS,
+                 grid_x=LBP_GRID_X, grid_y=LBP_GRID_Y):
+        """
+        初始化匹配器
+        Args:
+            top_k: 第一阶段保留的候选用户数
+            radius, neighbors, grid_x, grid_y: LBP参数，需与模型一致
+        """
+        self.top_k = top_k
+        self.radius = radius
+        self.neighbors = neighbors
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.lock = threading.RLock()
+        self._samples = {}  # 用户ID -> (n, D) 样本直方图
+        self._sample_sums = {}  # 用户ID -> 样本直方图行和，供卡方距离复用
+        self._ids = []  # 质心数组每一行对应的用户ID
+        self._rows = {}  # 用户ID -> 质心数组行号
+        self._centroids = np.empty((0, self.dimension), dtype=np.float32)
+
+    @property
+    def dimension(self):
+        """直方图长度"""
+        return self.grid_x * self.grid_y * (1 << self.neighbors)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, user_id):
+        return user_id in self._rows
+
+    def user_ids(self):
+        """返回当前图库中的用户ID列表"""
+        with self.lock:
+            return list(self._ids)
+
+    def histogram(self, face):
+        """按当前LBP参数计算人脸直方图"""
+        return lbp_histogram(face, self.radius, self.neighbors, self.grid_x, self.grid_y)
+
+    def histograms(self, faces):
+        """按当前LBP参数批量计算人脸直方图 (N, D)"""
+        return lbp_histograms(faces, self.radius, self.neighbors, self.grid_x, self.grid_y)
+
+    def load_from_recognizer(self, recognizer, user_ids=None):
+        """
+        从已加载的LBPH识别器中导入样本直方图
+        Args:
+            recognizer: cv2.face.LBPHFaceRecognizer 对象
+            user_ids: 可选，只导入这些用户（用于跳过已删除用户）
+        """
+        self.radius = recognizer.getRadius()
+        self.neighbors = recognizer.getNeighbors()
+        self.grid_x = recognizer.getGridX()
+        self.grid_y = recognizer.getGridY()
+
+        histograms = recognizer.getHistograms()
+        labels = recognizer.getLabels()
+        grouped = {}
+        if len(histograms):
+            gallery = np.vstack([np.asarray(h, dtype=np.float32).reshape(1, -1) for h in histograms])
+            labels = np.asarray(labels).ravel()
+            for user_id in np.unique(labels):
+                user_id = int(user_id)
+                if user_ids is None or user_id in user_ids:
+                    grouped[user_id] = gallery[labels == user_id]
+
+        with self.lock:
+            self._samples = {}
+            self._sample_sums = {}
+            self._ids = []
+            self._rows = {}
+            self._centroids = np.empty((0, self.dimension), dtype=np.float32)
+            for user_id, samples in grouped.items():
+                self._append_user(user_id, samples)
+
+    def add(self, user_id, histograms):
+        """
+        为用户追加样本（录入），增量更新其质心
+        Args:
+            user_id: 用户ID
+            histograms: 样本直方图列表或 (n, D) 数组
+        """
+        histograms = np.atleast_2d(np.asarray(histograms, dtype=np.float32))
+        if histograms.shape[0] == 0:
+            return
+        with self.lock:
+            if user_id not in self._rows:
+                self._append_user(user_id, histograms)
+                return
+            old = self._samples[user_id]
+            row = self._rows[user_id]
+            # 增量均值：c' = (c * n + sum(new)) / (n + m)
+            total = self._centroids[row] * len(old) + histograms.sum(axis=0)
+            self._samples[user_id] = np.vstack([old, histograms])
+            self._sample_sums[user_id] = self._samples[user_id].sum(axis=1, dtype=np.float64)
+            self._centroids[row] = total / len(self._samples[user_id])
+
+    def replace(self, user_id, histograms):
+        """用新样本替换用户的全部样本（重新采集）"""
+        with self.lock:
+            self.remove(user_id)
+            self.add(user_id, histograms)
+
+    def remove(self, user_id):
+        """从图库中删除用户，最后一行移入空位以保持质心数组紧凑"""
+        with self.lock:
+            if user_id not in self._rows:
+                return
+            row = self._rows.pop(user_id)
+            del self._samples[user_id]
+            del self._sample_sums[user_id]
+            last = len(self._ids) - 1
+            if row != last:
+                moved = self._ids[last]
+                self._centroids[row] = self._centroids[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._ids.pop()
+            self._centroids = self._centroids[:last]
+
+    def save_model(self, path):
+        """
+        将图库直接写成LBPH模型文件（与 LBPHFaceRecognizer.save 格式相同）
+        无需重新计算LBP，且不包含已删除或被替换的样本
+        Args:
+            path: 模型文件路径
+        """
+        with self.lock:
+            writer = ModelWriter(path, self.radius, self.neighbors, self.grid_x, self.grid_y)
+            try:
+                for user_id in self._ids:
+                    writer.write(user_id, self._samples[user_id])
+            finally:
+                writer.close()
+
+    def samples(self, user_id):
+        """返回用户的样本直方图 (n, D)"""
+        with self.lock:
+            return self._samples[user_id]
+
+    def predict(self, face):
+        """
+        识别人脸
+        Args:
+            face: 灰度人脸图像（100x100）
+        Returns:
+            tuple: (用户ID, 距离)，图库为空时返回 (-1, inf)
+        """
+        return self.predict_histogram(self.histogram(face))
+
+    def predict_batch(self, faces):
+        """
+        批量识别多张人脸
+        Args:
+            faces: 形状为 (N, 100, 100) 的灰度人脸数组
+        Returns:
+            list: 每张人脸的 (用户ID, 距离)
+        """
+        if len(faces) == 0:
+            return []
+        return self.predict_histograms(self.histograms(faces))
+
+    def predict_histogram(self, hist):
+        """对已计算好的直方图进行两阶段匹配"""
+        return self.predict_histograms(np.atleast_2d(hist))[0]
+
+    def predict_histograms(self, hists):
+        """
+        对一组直方图进行两阶段匹配
+        Args:
+            hists: 形状为 (N, D) 的直方图
+        Returns:
+            list: 每个直方图的 (用户ID, 距离)，图库为空时为 (-1, inf)
+        """
+        with self.lock:
+            if not self._ids:
+                return [(-1, float('inf'))] * len(hists)
+
+            # 第一阶段：所有探针一次性与用户质心比较，各自选出前K个候选
+            if len(self._ids) > self.top_k:
+                coarse = chi_square_distances(hists, self._centroids)
+                nearest = np.argpartition(coarse, self.top_k - 1, axis=1)[:, :self.top_k]
+                shortlists = [[self._ids[i] for i in row] for row in nearest]
+            else:
+                shortlists = [self._ids] * len(hists)
+
+            # 第二阶段：只与候选用户的样本精确比较
+            results = []
+            for hist, candidates in zip(hists, shortlists):
+                best_id, best_distance = -1, float('inf')
+                for user_id in candidates:
+                    distance = chi_square_distances(
+                        hist, self._samples[user_id], self._sample_sums[user_id]
+                    )[0].min()
+                    if distance < best_distance:
+                        best_id, best_distance = user_id, float(distance)
+                results.append((best_id, best_distance))
+            return results
+
+    def _append_user(self, user_id, samples):
+        """在质心数组末尾添加新用户"""
+        self._samples[user_id] = samples
+        self._sample_sums[user_id] = samples.sum(axis=1, dtype=np.float64)
+        self._rows[user_id] = len(self._ids)
+        self._ids.append(user_id)
+        self._centroids = np.vstack([self._centroids, samples.mean(axis=0, keepdims=True)])
+
+
+class ShardedMatcher:
+    """
+    分片匹配器
+    用户按ID哈希分布到多个 CentroidMatcher 分片中，每个分片单独持久化；
+    录入和删除只涉及一个分片，识别时并行查询所有分片并取距离最小的结果
+    """
+    def __init__(self, shards, top_k=5):
+        """
+        初始化分片匹配器
+        Args:
+            shards: 分片数量
+            top_k: 每个分片第一阶段保留的候选用户数
+        """
+        self.shards = [CentroidMatcher(top_k=top_k) for _ in range(shards)]
+        self.executor = ThreadPoolExecutor(max_workers=shards) if shards > 1 else None
+
+    def shard_index(self, user_id):
+        """返回用户所在的分片编号"""
+        return hash(user_id) % len(self.shards)
+
+    def shard_for(self, user_id):
+        """返回用户所在的分片"""
+        return self.shards[self.shard_index(user_id)]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def __contains__(self, user_id):
+        return user_id in self.shard_for(user_id)
+
+    def user_ids(self):
+        """返回所有分片中的用户ID列表"""
+        return [user_id for shard in self.shards for user_id in shard.user_ids()]
+
+    def histogram(self, face):
+        """计算人脸直方图（所有分片LBP参数相同）"""
+        return self.shards[0].histogram(face)
+
+    def histograms(self, faces):
+        """批量计算人脸直方图 (N, D)"""
+        return self.shards[0].histograms(faces)
+
+    def add(self, user_id, histograms):
+        """为用户追加样本，只修改其所在分片"""
+        self.shard_for(user_id).add(user_id, histograms)
+
+    def replace(self, user_id, histograms):
+        """替换用户的全部样本，只修改其所在分片"""
+        self.shard_for(user_id).replace(user_id, histograms)
+
+    def remove(self, user_id):
+        """删除用户，只修改其所在分片"""
+        self.shard_for(user_id).remove(user_id)
+
+    def samples(self, user_id):
+        """返回用户的样本直方图 (n, D)"""
+        return self.shard_for(user_id).samples(user_id)
+
+    def predict(self, face):
+        """识别单张人脸，返回 (用户ID, 距离)"""
+        return self.predict_histograms(np.atleast_2d(self.histogram(face)))[0]
+
+    def predict_batch(self, faces):
+        """批量识别多张人脸，返回每张人脸的 (用户ID, 距离)"""
+        if len(faces) == 0:
+            return []
+        return self.predict_histograms(self.histograms(faces))
+
+    def predict_histogram(self, hist):
+        """对已计算好的直方图进行匹配"""
+        return self.predict_histograms(np.atleast_2d(hist))[0]
+
+    def predict_histograms(self, hists):
+        """
+        并行查询所有分片，每个探针取各分片中距离最小的结果
+        Args:
+            hists: 形状为 (N, D) 的直方图
+        Returns:
+            list: 每个直方图的 (用户ID, 距离)
+        """
+        if len(self.shards) == 1:
+            return self.shards[0].predict_histograms(hists)
+        if self.executor is None:
+            # 未使用线程池（如多进程工作池中的进程）时依次查询
+            per_shard = [shard.predict_histograms(hists) for shard in self.shards]
+        else:
+            per_shard = list(self.executor.map(lambda shard: shard.predict_histograms(hists), self.shards))
+        return [min(candidates, key=lambda result: result[1]) for candidates in zip(*per_shard)]
@@ -0,0 +1,149 @@
+import json  # 配置文件
+import threading  # 线程本地缓存
+
+import cv2  # OpenCV库，用于图像处理
+import numpy as np  # 数值计算库
+
+EQUALIZE_METHODS = (None, 'hist', 'clahe')
+
+
+class FacePreprocessor:
+    """
+    人脸预处理
+    只作用于100x100的人脸图像（不处理整帧），录入和识别使用同一配置：
+    人眼对齐 -> 伽马校正（预先计算的查找表） -> 直方图均衡化或CLAHE。
+    查找表、CLAHE对象和人眼检测器只创建一次，每个线程各持有一份
+    """
+    def __init__(self, equalize=None, clip_limit=2.0, tile_size=8, gamma=1.0, align=False):
+        """
+        初始化预处理配置
+        Args:
+            equalize: None、'hist'（全局直方图均衡化）或 'clahe'（自适应直方图均衡化）
+            clip_limit: CLAHE对比度限制
+            tile_size: CLAHE分块数（每边）
+            gamma: 伽马值，大于1提亮暗部，1表示不校正
+            align: 是否根据双眼位置旋转对齐人脸
+        Raises:
+            ValueError: 参数无效
+        """
+        if equalize not in EQUALIZE_METHODS:
+            raise ValueError(f"未知的均衡化方法: {equalize}")
+        if gamma <= 0:
+            raise ValueError("伽马值必须大于0")
+        self.equalize = equalize
+        self.clip_limit = float(clip_limit)
+        self.tile_size = int(tile_size)
+        self.gamma = float(gamma)
+        self.align = bool(align)
+        self.lut = None
+        if self.gamma != 1.0:
+            levels = np.arange(256, dtype=np.float64) / 255.0
+            self.lut = np.clip(np.round(255.0 * levels ** (1.0 / self.gamma)), 0, 255).astype(np.uint8)
+        self.local = threading.local()
+
+    @property
+    def enabled(self):
+        """是否有任何预处理步骤"""
+        return self.align or self.lut is not None or self.equalize is not None
+
+    @property
+    def config(self):
+        """可写入配置文件的参数字典"""
+        return {
+            'equalize': self.equalize,
+            'clip_limit': self.clip_limit,
+            'tile_size': self.tile_size,
+            'gamma': self.gamma,
+            'align': self.align,
+        }
+
+    def __eq__(self, other):
+        return isinstance(other, FacePreprocessor) and self.config == other.config
+
+    @classmethod
+    def load(cls, path):
+        """
+        从配置文件读取，文件不存在时返回不做任何处理的预处理器
+        Args:
+            path: 配置文件路径
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(**json.load(f))
+        except FileNotFoundError:
+            return cls()
+
+    def save(self, path):
+        """写入配置文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.config, f, indent=2)
+
+    def clahe(self):
+        """当前线程的CLAHE对象（OpenCV算法对象不能跨线程共用）"""
+        clahe = getattr(self.local, 'clahe', None)
+        if clahe is None:
+            clahe = cv2.createCLAHE(clipLimit=self.clip_limit,
+                                    tileGridSize=(self.tile_size, self.tile_size))
+            self.local.clahe = clahe
+        return clahe
+
+    def eye_cascade(self):
+        """当前线程的人眼检测器"""
+        cascade = getattr(self.local, 'eye_cascade', None)
+        if cascade is None:
+            cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+            self.local.eye_cascade = cascade
+        return cascade
+
+    def align_face(self, face, max_angle=20.0):
+        """
+        检测人脸上半部分的双眼，旋转使双眼连线水平
+        Args:
+            face: 100x100灰度人脸
+            max_angle: 超过此角度视为误检，不做旋转
+        Returns:
+            numpy.ndarray: 对齐后的人脸（未检测到双眼时原样返回）
+        """
+        height, width = face.shape
+        eyes = self.eye_cascade().detectMultiScale(
+            face[:height // 2], scaleFactor=1.1, minNeighbors=3,
+            minSize=(width // 10, width // 10), maxSize=(width // 2, width // 2))
+        if len(eyes) < 2:
+            return face
+        eyes = sorted(eyes, key=lambda eye: eye[2] * eye[3], reverse=True)[:2]
+        (x1, y1, w1, h1), (x2, y2, w2, h2) = sorted(eyes, key=lambda eye: eye[0])
+        dx = (x2 + w2 / 2) - (x1 + w1 / 2)
+        dy = (y2 + h2 / 2) - (y1 + h1 / 2)
+        angle = np.degrees(np.arctan2(dy, dx))
+        if abs(angle) < 1.0 or abs(angle) > max_angle:
+            return face
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        return cv2.warpAffine(face, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE)
+
+    def apply(self, faces):
+        """
+        批量预处理人脸
+        Args:
+            faces: 形状为 (N, H, W) 的灰度人脸数组
+        Returns:
+            numpy.ndarray: 预处理后的新数组（未启用任何步骤时直接返回输入）
+        """
+        if not self.enabled:
+            return faces
+        faces = np.array(faces, dtype=np.uint8)
+        if len(faces) == 0:
+            return faces
+        if self.align:
+            for i in range(len(faces)):
+                faces[i] = self.align_face(faces[i])
+        if self.lut is not None:
+            # 整批人脸视为一张图像，只调用一次查找表
+            faces = cv2.LUT(faces.reshape(-1, faces.shape[-1]), self.lut).reshape(faces.shape)
+        if self.equalize == 'hist':
+            for face in faces:
+                cv2.equalizeHist(face, dst=face)
+        elif self.equalize == 'clahe':
+            clahe = self.clahe()
+            for i in range(len(faces)):
+                faces[i] = clahe.apply(faces[i])
+        return faces
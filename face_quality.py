@@ -0,0 +1,121 @@
+import cv2  # OpenCV库，用于图像质量评估
+import numpy as np  # 数值计算库
+
+# 默认录入样本数：样本经过多样性筛选，少量样本即可覆盖主要变化，图库也更小
+SAMPLE_TARGET = 10
+
+
+class FaceQualityChecker:
+    """
+    人脸样本质量检查
+    使用拉普拉斯方差（清晰度）、平均亮度、人脸尺寸和左右对称性（近似正脸判断）
+    过滤掉不适合作为录入样本的人脸
+    """
+    def __init__(self, min_sharpness=60.0, min_brightness=50, max_brightness=205,
+                 min_face_size=80, max_asymmetry=40.0):
+        """
+        初始化质量检查参数
+        Args:
+            min_sharpness: 最小拉普拉斯方差，低于此值视为模糊
+            min_brightness: 最小平均亮度
+            max_brightness: 最大平均亮度
+            min_face_size: 人脸区域的最小边长（像素，原始尺寸）
+            max_asymmetry: 左右半脸平均灰度差的上限，过大说明侧脸或光照不均
+        """
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.min_face_size = min_face_size
+        self.max_asymmetry = max_asymmetry
+
+    def check(self, face_roi):
+        """
+        检查单个人脸区域
+        Args:
+            face_roi: 原始尺寸的灰度人脸区域
+        Returns:
+            tuple: (是否通过, 未通过原因)，通过时原因为空字符串
+        """
+        height, width = face_roi.shape[:2]
+        if min(height, width) < self.min_face_size:
+            return False, "人脸过小"
+
+        brightness = float(face_roi.mean())
+        if brightness < self.min_brightness:
+            return False, "光线过暗"
+        if brightness > self.max_brightness:
+            return False, "光线过亮"
+
+        # 在固定尺寸上评估清晰度，避免不同人脸大小导致结果不可比
+        small = cv2.resize(face_roi, (64, 64), interpolation=cv2.INTER_AREA)
+        if cv2.Laplacian(small, cv2.CV_64F).var() < self.min_sharpness:
+            return False, "图像模糊"
+
+        # 左半脸与镜像后的右半脸比较，差异过大说明姿态偏转
+        half = small.shape[1] // 2
+        left = small[:, :half].astype(np.int16)
+        right = small[:, -half:][:, ::-1].astype(np.int16)
+        if np.abs(left - right).mean() > self.max_asymmetry:
+            return False, "请正对摄像头"
+
+        return True, ""
+
+
+class SampleSelector:
+    """
+    录入样本选择器
+    先做质量检查，再与已接受的样本比较，拒绝过于相似的帧，
+    使有限的样本覆盖更多表情、角度和光照变化
+    """
+    def __init__(self, target=SAMPLE_TARGET, min_difference=6.0, checker=None, thumb_size=24):
+        """
+        初始化选择器
+        Args:
+            target: 需要采集的样本数量
+            min_difference: 与已接受样本的最小平均灰度差（缩略图上），低于此值视为重复
+            checker: FaceQualityChecker 对象，默认使用默认参数
+            thumb_size: 用于相似度比较的缩略图边长
+        """
+        self.target = target
+        self.min_difference = min_difference
+        self.checker = checker or FaceQualityChecker()
+        self.thumb_size = thumb_size
+        self.samples = []  # 已接受的100x100样本
+        self._thumbs = np.empty((target, thumb_size * thumb_size), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def is_complete(self):
+        """是否已采集足够的样本"""
+        return len(self.samples) >= self.target
+
+    def offer(self, face_roi):
+        """
+        提交一个候选人脸区域
+        Args:
+            face_roi: 原始尺寸的灰度人脸区域
+        Returns:
+            tuple: (是否接受, 未接受原因)
+        """
+        if self.is_complete:
+            return False, "样本已足够"
+
+        ok, reason = self.checker.check(face_roi)
+        if not ok:
+            return False, reason
+
+        # 缩略图去均值后比较，对整体亮度变化不敏感
+        thumb = cv2.resize(face_roi, (self.thumb_size, self.thumb_size),
+                           interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+        thumb -= thumb.mean()
+        count = len(self.samples)
+        if count:
+            differences = np.abs(self._thumbs[:count] - thumb).mean(axis=1)
+            if differences.min() < self.min_difference:
+                return False, "与已有样本过于相似"
+
+        self._thumbs[count] = thumb
+        self.samples.append(cv2.resize(face_roi, (100, 100)))
+        return True, ""
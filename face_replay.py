@@ -0,0 +1,283 @@
+import glob  # 图片序列匹配
+import json  # 记录文件
+import os  # 文件和目录操作
+import time  # 时间处理
+
+import cv2  # OpenCV库，用于视频和图片读取
+import numpy as np  # 数值计算库
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def parse_pacing(value):
+    """
+    解析回放节奏参数
+    Args:
+        value: 'realtime'（按原始帧率）、'max'（尽可能快）或帧率数字
+    Returns:
+        str 或 float: 'realtime'、'max' 或固定帧率
+    Raises:
+        ValueError: 参数无效
+    """
+    if value in ('realtime', 'max'):
+        return value
+    fps = float(value)
+    if fps <= 0:
+        raise ValueError("回放帧率必须大于0")
+    return fps
+
+
+class ReplaySource:
+    """
+    录制视频或图片序列的回放源
+    接口与 cv2.VideoCapture 相同（read、isOpened、release、get、set），
+    可以直接替换摄像头接入现有处理流程；timestamp 为当前帧在录像中的时间，
+    回放时以它代替系统时钟，使运动门控等与时间相关的决策在每次回放中保持一致
+    """
+    def __init__(self, path, pacing='realtime', fps=None):
+        """
+        打开回放源
+        Args:
+            path: 视频文件、图片目录或图片通配符（如 frames/*.png）
+            pacing: 'realtime'、'max' 或固定帧率，见 parse_pacing()
+            fps: 录像帧率，默认读取视频文件的帧率，图片序列为30
+        Raises:
+            ValueError: 无法打开回放源
+        """
+        self.path = path
+        self.pacing = parse_pacing(pacing)
+        self.images = None
+        self.cap = None
+        if os.path.isdir(path):
+            self.images = sorted(os.path.join(path, name) for name in os.listdir(path)
+                                 if name.lower().endswith(IMAGE_EXTENSIONS))
+        elif glob.has_magic(path):
+            self.images = sorted(glob.glob(path))
+        if self.images is not None:
+            if not self.images:
+                raise ValueError(f"没有找到图片: {path}")
+            self.fps = fps or 30.0
+        else:
+            self.cap = cv2.VideoCapture(path)
+            if not self.cap.isOpened():
+                self.cap.release()
+                raise ValueError(f"无法打开视频: {path}")
+            self.fps = fps or self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.index = 0  # 已读取的帧数
+        self.started = None  # 第一帧的系统时间
+
+    @property
+    def timestamp(self):
+        """最近读取的一帧在录像中的时间（秒）"""
+        return max(self.index - 1, 0) / self.fps
+
+    def isOpened(self):
+        return self.cap is not None or self.images is not None
+
+    def read(self):
+        """
+        按回放节奏读取下一帧
+        Returns:
+            tuple: (是否成功, 帧)
+        """
+        if self.images is not None:
+            frame = None
+            while frame is None:
+                if self.index >= len(self.images):
+                    return False, None
+                frame = cv2.imread(self.images[self.index])
+                if frame is None:
+                    # 跳过无法解码的图片，后续帧在录像中的时间不变
+                    print(f"跳过无法读取的图片: {self.images[self.index]}")
+                    self.index += 1
+            ret = True
+        elif self.cap is not None:
+            ret, frame = self.cap.read()
+        else:
+            return False, None
+        if not ret:
+            return False, None
+
+        if self.pacing != 'max':
+            fps = self.fps if self.pacing == 'realtime' else self.pacing
+            now = time.perf_counter()
+            if self.started is None:
+                self.started = now
+            delay = self.started + self.index / fps - now
+            if delay > 0:
+                time.sleep(delay)
+        self.index += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.index
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            if self.images is not None:
+                return len(self.images)
+            return self.cap.get(prop) if self.cap is not None else 0
+        return 0
+
+    def set(self, prop, value):
+        """回放源不支持修改采集参数"""
+        return False
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+        self.cap = None
+        self.images = None
+
+
+def open_capture(source, pacing=None):
+    """
+    打开视频源
+    Args:
+        source: 摄像头编号、视频文件、图片目录/通配符或流地址
+        pacing: 指定时以 ReplaySource 回放文件；图片目录和通配符总是回放
+    Returns:
+        cv2.VideoCapture 或 ReplaySource
+    """
+    if isinstance(source, str) and (pacing is not None or os.path.isdir(source)
+                                    or glob.has_magic(source)):
+        return ReplaySource(source, pacing or 'max')
+    return cv2.VideoCapture(source)
+
+
+class FrameRecorder:
+    """
+    逐帧记录检测决策、识别结果和耗时（JSON Lines，每行一帧）
+    """
+    def __init__(self, path):
+        """
+        创建记录文件
+        Args:
+            path: 记录文件路径
+        """
+        self.path = path
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def record(self, frame, detected, faces, latency_ms, source=None):
+        """
+        记录一帧
+        Args:
+            frame: 帧序号
+            detected: 是否运行了人脸检测
+            faces: 人脸结果字典列表（见 face_engine.face_result）
+            latency_ms: 处理耗时（毫秒）
+            source: 可选，视频源名称
+        """
+        entry = {
+            'frame': frame,
+            'detected': bool(detected),
+            'faces': [{'box': face['box'], 'user_id': face['user_id'],
+                       'confidence': face['confidence']} for face in faces],
+            'latency_ms': round(latency_ms, 3),
+        }
+        if source is not None:
+            entry['source'] = str(source)
+        self.file.write(json.dumps(entry) + '\n')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def load_run(path):
+    """
+    读取记录文件
+    Returns:
+        dict: (视频源, 帧序号) -> 帧记录
+    """
+    frames = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                frames[(entry.get('source'), entry['frame'])] = entry
+    return frames
+
+
+def box_iou(a, b):
+    """两个 (x, y, w, h) 矩形的交并比"""
+    width = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    height = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    inter = width * height
+    return inter / (a[2] * a[3] + b[2] * b[3] - inter)
+
+
+def frame_matches(baseline, current, iou_threshold=0.5):
+    """
+    比较同一帧的两次记录
+    Returns:
+        bool: 检测决策相同，且每张人脸都能按位置和身份一一对应
+    """
+    if baseline['detected'] != current['detected']:
+        return False
+    if len(baseline['faces']) != len(current['faces']):
+        return False
+    remaining = list(current['faces'])
+    for face in baseline['faces']:
+        match = next((other for other in remaining
+                      if other['user_id'] == face['user_id']
+                      and box_iou(face['box'], other['box']) >= iou_threshold), None)
+        if match is None:
+            return False
+        remaining.remove(match)
+    return True
+
+
+def latency_percentile(run, keys, percentile):
+    """指定帧的处理耗时百分位数（毫秒）"""
+    if not keys:
+        return 0.0
+    return float(np.percentile([run[key]['latency_ms'] for key in keys], percentile))
+
+
+def compare_runs(baseline_path, current_path, latency_tolerance=0.2, min_latency_ms=1.0,
+                 max_mismatch=0.0, iou_threshold=0.5):
+    """
+    将一次回放记录与基准记录比较，找出延迟或准确性回退
+    Args:
+        baseline_path: 基准记录文件
+        current_path: 本次记录文件
+        latency_tolerance: 延迟中位数或P95允许增加的比例
+        min_latency_ms: 延迟增加小于此值（毫秒）时忽略
+        max_mismatch: 允许决策或结果不一致的帧比例
+        iou_threshold: 人脸位置视为相同的最小交并比
+    Returns:
+        dict: 包含 frames、mismatched、missing、latency 和 regressions（问题描述列表）
+    """
+    baseline = load_run(baseline_path)
+    current = load_run(current_path)
+    common = [key for key in baseline if key in current]
+    missing = len(baseline) - len(common)
+    mismatched = [key for key in common
+                  if not frame_matches(baseline[key], current[key], iou_threshold)]
+
+    regressions = []
+    latency = {}
+    for name, percentile in (('p50', 50), ('p95', 95)):
+        before = latency_percentile(baseline, common, percentile)
+        after = latency_percentile(current, common, percentile)
+        latency[name] = (before, after)
+        if after > before * (1 + latency_tolerance) and after - before >= min_latency_ms:
+            regressions.append(f"延迟{name}从 {before:.2f} ms 增加到 {after:.2f} ms")
+    if missing:
+        regressions.append(f"{missing} 帧在本次记录中缺失")
+    if common and len(mismatched) / len(common) > max_mismatch:
+        first = ', '.join(f"{source}#{frame}" if source else str(frame)
+                          for source, frame in mismatched[:5])
+        regressions.append(f"{len(mismatched)}/{len(common)} 帧的检测决策或识别结果不一致（如 {first}）")
+    return {
+        'frames': len(common),
+        'mismatched': len(mismatched),
+        'missing': missing,
+        'latency': latency,
+        'regressions': regressions,
+    }
@@ -0,0 +1,274 @@
+import json  # JSON编解码
+import queue  # 线程安全队列
+import threading  # 多线程处理
+import time  # 时间处理
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # 本地HTTP服务
+from urllib.parse import parse_qs, urlparse  # URL解析
+
+import cv2  # OpenCV库，用于图像解码和缩放
+import numpy as np  # 数值计算库
+
+from face_engine import face_result  # 识别结果格式
+
+
+class ServiceBusy(Exception):
+    """等待队列已满，请求被拒绝（背压）"""
+
+
+class RecognitionRequest:
+    """一次识别请求及其结果"""
+    __slots__ = ('gray', 'faces', 'event', 'result', 'error', 'abandoned')
+
+    def __init__(self, gray, faces):
+        self.gray = gray
+        self.faces = faces
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False  # 请求方已超时放弃，批处理线程直接丢弃
+
+
+class RecognitionService:
+    """
+    本地识别服务的批处理核心
+    人脸检测在各请求线程中并行执行（OpenCV会释放GIL，每个线程使用各自的检测器），
+    识别阶段在短时间窗口内收集并发请求，把所有人脸合并为一批；
+    同时处理的请求数有上限，超出时立即拒绝新请求
+    """
+    def __init__(self, engine, batch_window=0.01, max_batch=16, max_pending=64, timeout=5.0):
+        """
+        初始化服务
+        Args:
+            engine: 已加载的 FaceEngine 对象
+            batch_window: 收集一批请求的最长等待时间（秒）
+            max_batch: 每批最多处理的请求数
+            max_pending: 同时处理的请求数上限，超出时返回繁忙
+            timeout: 单个请求等待结果的最长时间（秒）
+        """
+        self.engine = engine
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.pending = queue.Queue()
+        self.is_running = False
+        self.worker = None
+        self.roi_batch = np.empty((max_batch, 100, 100), dtype=np.uint8)  # 预分配的人脸数组
+
+    def start(self):
+        """启动批处理线程"""
+        self.is_running = True
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def stop(self):
+        """停止批处理线程"""
+        self.is_running = False
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+
+    def submit(self, gray):
+        """
+        提交一张灰度图像并等待识别结果
+        Args:
+            gray: 灰度图像
+        Returns:
+            list: 每张人脸的结果字典
+        Raises:
+            ServiceBusy: 同时处理的请求已达上限
+            TimeoutError: 超时未得到结果
+        """
+        if not self.slots.acquire(blocking=False):
+            raise ServiceBusy("服务繁忙")
+        try:
+            request = RecognitionRequest(gray, self.engine.detect(gray))
+            if len(request.faces) == 0:
+                return []
+            self.pending.put(request)
+            if not request.event.wait(self.timeout):
+                # 名额随即释放，标记后队列中的请求不再占用批处理
+                request.abandoned = True
+                raise TimeoutError("识别超时")
+            if request.error is not None:
+                raise request.error
+            return request.result
+        finally:
+            self.slots.release()
+
+    def run(self):
+        """批处理循环：收集一个时间窗口内的请求后统一处理"""
+        while self.is_running:
+            try:
+                first = self.pending.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            batch = [first] if not first.abandoned else []
+            deadline = time.perf_counter() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if not request.abandoned:
+                    batch.append(request)
+            if batch:
+                self.process(batch)
+
+    def process(self, batch):
+        """
+        处理一批请求：所有请求的人脸合并后一次识别
+        Args:
+            batch: RecognitionRequest 列表
+        """
+        total = sum(len(request.faces) for request in batch)
+        if self.roi_batch.shape[0] < total:
+            self.roi_batch = np.empty((total, 100, 100), dtype=np.uint8)
+        rois = self.roi_batch[:total]
+        i = 0
+        for request in batch:
+            for (x, y, w, h) in request.faces:
+                cv2.resize(request.gray[y:y+h, x:x+w], (100, 100), dst=rois[i])
+                i += 1
+
+        try:
+            results = self.engine.recognize(rois)
+        except Exception as e:
+            for request in batch:
+                request.error = e
+                request.event.set()
+            return
+
+        i = 0
+        for request in batch:
+            count = len(request.faces)
+            request.result = [
+                face_result(box, *result)
+                for box, result in zip(request.faces, results[i:i + count])
+            ]
+            i += count
+            request.event.set()
+
+
+def decode_image(body, content_type, query):
+    """
+    将请求体解码为灰度图像
+    Args:
+        body: 请求体字节
+        content_type: image/jpeg、image/png 或 application/octet-stream（原始灰度）
+        query: 查询参数字典，原始灰度需提供 width 和 height
+    Returns:
+        numpy.ndarray: 灰度图像
+    Raises:
+        ValueError: 无法解码
+    """
+    if content_type == 'application/octet-stream':
+        try:
+            width = int(query['width'][0])
+            height = int(query['height'][0])
+        except (KeyError, ValueError):
+            raise ValueError("原始灰度图像需要 width 和 height 参数")
+        if width * height != len(body):
+            raise ValueError("图像尺寸与数据长度不一致")
+        return np.frombuffer(body, dtype=np.uint8).reshape(height, width)
+
+    gray = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise ValueError("无法解码图像")
+    return gray
+
+
+class RecognitionHandler(BaseHTTPRequestHandler):
+    """
+    HTTP请求处理
+    GET  /health     服务状态
+    POST /recognize  提交图像，返回检测到的人脸及识别结果
+    """
+    max_body = 16 * 1024 * 1024  # 请求体上限
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/health':
+            self.send_json(404, {'error': "未知路径"})
+            return
+        service = self.server.service
+        self.send_json(200, {
+            'status': 'ok',
+            'users': len(service.engine.users),
+            'pending': service.pending.qsize(),
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/recognize':
+            self.send_json(404, {'error': "未知路径"})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        if length <= 0 or length > self.max_body:
+            self.send_json(413 if length > 0 else 400, {'error': "请求体为空或过大"})
+            return
+        body = self.rfile.read(length)
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip()
+
+        try:
+            gray = decode_image(body, content_type, parse_qs(url.query))
+            start = time.perf_counter()
+            faces = self.server.service.submit(gray)
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+        except ServiceBusy as e:
+            self.send_json(503, {'error': str(e)}, {'Retry-After': '1'})
+        except TimeoutError as e:
+            self.send_json(504, {'error': str(e)})
+        except Exception as e:
+            print(f"识别服务错误: {e}")
+            self.send_json(500, {'error': str(e)})
+        else:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.send_json(200, {'faces': faces, 'elapsed_ms': round(elapsed, 2)})
+
+    def send_json(self, status, payload, headers=None):
+        """发送JSON响应"""
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        """不输出每个请求的访问日志"""
+
+
+class RecognitionServer(ThreadingHTTPServer):
+    """多线程HTTP服务，连接等待队列加大以应对突发并发"""
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def serve(engine, host='127.0.0.1', port=8765, **options):
+    """
+    启动本地识别服务（阻塞，Ctrl+C 退出）
+    Args:
+        engine: 已加载的 FaceEngine 对象
+        host: 监听地址，默认只监听本机
+        port: 监听端口
+        options: 传给 RecognitionService 的批处理参数
+    """
+    service = RecognitionService(engine, **options)
+    service.start()
+    server = RecognitionServer((host, port), RecognitionHandler)
+    server.service = service
+    print(f"识别服务已启动: http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
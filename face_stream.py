@@ -0,0 +1,187 @@
+import asyncio  # 异步IO
+import time  # 时间处理
+from concurrent.futures import ThreadPoolExecutor  # 读取线程
+
+import cv2  # OpenCV库，用于视频读取
+
+from face_replay import open_capture  # 摄像头或录像回放
+
+
+class AsyncFrameSource:
+    """
+    异步视频帧源
+    阻塞的 cv2.VideoCapture 调用在读取线程中执行，事件循环不会被阻塞；
+    默认每个视频源使用专用的读取线程，卡住的视频源不会占用检测识别的线程池；
+    通过 async for 逐帧迭代，任务取消即停止，退出时保证释放摄像头
+    """
+    def __init__(self, source=0, width=None, height=None, executor=None, pacing=None,
+                 close_timeout=2.0):
+        """
+        初始化帧源（不会立即打开设备）
+        Args:
+            source: 摄像头编号、视频文件路径、图片目录或流地址
+            width: 可选，期望的采集宽度
+            height: 可选，期望的采集高度
+            executor: 执行阻塞调用的线程池，None 时为该视频源创建专用的读取线程
+            pacing: 可选，以 'realtime'、'max' 或固定帧率回放录像，见 face_replay
+            close_timeout: 停止时等待正在进行的读取的最长时间（秒）
+        """
+        self.source = source
+        self.pacing = pacing
+        self.width = width
+        self.height = height
+        self.executor = executor
+        self.own_executor = executor is None
+        self.close_timeout = close_timeout
+        self.cap = None
+        self.frame_count = 0
+
+    async def open(self):
+        """在读取线程中打开视频源"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='frame-reader')
+        loop = asyncio.get_running_loop()
+        self.cap = await loop.run_in_executor(self.executor, self._open)
+
+    def _open(self):
+        cap = open_capture(self.source, self.pacing)
+        if not cap.isOpened():
+            cap.release()
+            raise ValueError(f"无法打开视频源: {self.source}")
+        if self.width:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        return cap
+
+    async def close(self):
+        """在读取线程中释放视频源"""
+        if self.cap is not None:
+            cap, self.cap = self.cap, None
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, cap.release)
+        if self.own_executor and self.executor is not None:
+            # 不等待：读取卡住时线程在读取返回后自行退出
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __aiter__(self):
+        return self.frames()
+
+    async def frames(self):
+        """
+        逐帧读取，视频结束时停止迭代
+        取消时最多等待 close_timeout 秒让正在进行的读取结束再释放设备；
+        读取仍未返回（如网络流卡住）时不再等待，由读取线程在读取返回后释放
+        """
+        if self.cap is None:
+            await self.open()
+        pending = None
+        try:
+            while True:
+                pending = self.executor.submit(self.cap.read)
+                ret, frame = await asyncio.wrap_future(pending)
+                pending = None
+                if not ret:
+                    break
+                self.frame_count += 1
+                yield frame
+        finally:
+            # 不能在另一个线程仍在 read() 时释放设备
+            if pending is not None:
+                done, _ = await asyncio.wait([asyncio.wrap_future(pending)],
+                                             timeout=self.close_timeout)
+                if not done:
+                    cap, self.cap = self.cap, None
+                    pending.add_done_callback(lambda _: cap.release())
+            await self.close()
+
+
+async def process_stream(engine, source, executor=None, gate=None, region=None):
+    """
+    异步处理一个视频源，逐帧产出识别结果
+    Args:
+        engine: 已加载的 FaceEngine 对象
+        source: AsyncFrameSource 对象
+        executor: 执行检测识别的线程池，None 使用事件循环默认线程池
+        gate: 可选，该视频源专用的 MotionGate，静止画面跳过检测
+        region: 可选，该视频源专用的 DetectionRegion
+    Yields:
+        dict: 包含 index、timestamp、latency_ms、detected 和 faces 的帧结果
+    """
+    loop = asyncio.get_running_loop()
+    frames = source.frames()
+    faces = []
+    try:
+        async for frame in frames:
+            start = time.perf_counter()
+            # 回放录像时用录像时间驱动运动门控，每次回放的决策相同
+            now = getattr(source.cap, 'timestamp', None)
+            result = await loop.run_in_executor(
+                executor, analyze_frame, engine, frame, gate, len(faces) > 0, region, now)
+            faces = result if result is not None else []
+            yield {
+                'index': source.frame_count,
+                'timestamp': time.time(),
+                'latency_ms': (time.perf_counter() - start) * 1000,
+                'detected': result is not None,
+                'faces': faces,
+            }
+    finally:
+        # 立即关闭帧迭代器以释放设备，而不是等待垃圾回收
+        await frames.aclose()
+
+
+def analyze_frame(engine, frame, gate=None, tracking=False, region=None, now=None):
+    """
+    转为灰度后检测并识别一帧中的人脸（在线程池中执行）
+    Returns:
+        list: 每张人脸的结果字典；运动门控跳过该帧时返回 None
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    if gate is not None and not gate.should_detect(gray, tracking, now):
+        return None
+    return engine.analyze(gray, region)
+
+
+async def watch_sources(engine, sources, on_result, executor=None, gate_factory=None,
+                        region_factory=None, pacing=None):
+    """
+    并发处理多个视频源，直到全部结束或任务被取消
+    Args:
+        engine: 已加载的 FaceEngine 对象
+        sources: 摄像头编号或视频路径列表
+        on_result: 回调函数 on_result(source, result)
+        executor: 检测识别共用的线程池（读取帧在各视频源专用的线程中进行）
+        gate_factory: 可选，为每个视频源创建 MotionGate 的函数
+        region_factory: 可选，region_factory(source) 返回该视频源的 DetectionRegion
+        pacing: 可选，录像文件的回放节奏
+    """
+    async def run(source):
+        gate = gate_factory() if gate_factory is not None else None
+        region = region_factory(source) if region_factory is not None else None
+        results = process_stream(engine, AsyncFrameSource(source, pacing=pacing),
+                                 executor, gate, region)
+        try:
+            async for result in results:
+                on_result(source, result)
+        except Exception as e:
+            # 单个视频源出错不影响其他视频源
+            print(f"视频源 {source} 错误: {e}")
+        finally:
+            await results.aclose()
+
+    tasks = [asyncio.create_task(run(source)) for source in sources]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,285 @@
+import multiprocessing as mp  # 多进程
+import os  # 文件和目录操作
+import queue  # 队列异常类型
+import sys  # 平台判断
+import time  # 时间处理
+from collections import deque  # 按提交顺序保存在途帧
+from multiprocessing import shared_memory  # 共享内存
+
+import numpy as np  # 数值计算库
+
+# Linux 上以 fork 启动的工作进程直接继承父进程中已加载的引擎（写时复制，图库只加载一次）
+inherited_engine = None
+
+
+class FrameRing:
+    """
+    共享内存帧环形缓冲区
+    一块共享内存切分为固定数量的槽位，每个槽位可存放一帧灰度图像；
+    进程间只传递槽位编号和尺寸，帧数据本身不会被序列化
+    """
+    def __init__(self, slots, max_shape, name=None):
+        """
+        创建或连接共享内存
+        Args:
+            slots: 槽位数量
+            max_shape: 单帧最大尺寸 (高, 宽)
+            name: 已存在的共享内存名称，None 时新建
+        """
+        self.slots = slots
+        self.max_shape = tuple(max_shape)
+        self.slot_size = self.max_shape[0] * self.max_shape[1]
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+    @property
+    def name(self):
+        """共享内存名称，供子进程连接"""
+        return self.shm.name
+
+    def view(self, slot, shape):
+        """返回槽位中指定尺寸帧的numpy视图（不复制）"""
+        height, width = shape
+        return np.ndarray((height, width), dtype=np.uint8, buffer=self.shm.buf,
+                          offset=slot * self.slot_size)
+
+    def write(self, slot, gray):
+        """
+        将灰度帧复制到槽位
+        Returns:
+            tuple: 帧尺寸 (高, 宽)
+        """
+        height, width = gray.shape
+        if height > self.max_shape[0] or width > self.max_shape[1]:
+            raise ValueError(f"帧尺寸 {width}x{height} 超过共享内存槽位上限")
+        self.view(slot, (height, width))[:] = gray
+        return height, width
+
+    def close(self):
+        """断开共享内存，创建者同时释放它"""
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def worker_main(ring_name, slots, max_shape, data_dir, model_path, shards, tasks, results):
+    """
+    识别工作进程入口
+    使用继承自父进程的引擎，或在启动时加载一次模型，之后从共享内存读取帧
+    进行检测和识别，只通过队列回传结果；加载失败时回传错误后退出
+    """
+    import cv2
+    from face_engine import FaceEngine
+
+    # 并行由多个进程提供，每个进程内OpenCV只用一个线程，避免线程数超过CPU核数
+    cv2.setNumThreads(1)
+    ring = FrameRing(slots, max_shape, name=ring_name)
+    try:
+        engine = inherited_engine
+        if engine is None:
+            engine = FaceEngine(data_dir=data_dir, model_path=model_path, shards=shards)
+            engine.load()
+        if getattr(engine.matcher, 'executor', None) is not None:
+            # 父进程的线程不会复制到子进程，分片在本进程内依次查询
+            engine.matcher.executor = None
+    except Exception as e:
+        results.put(('ready', os.getpid(), None, str(e)))
+        ring.shm.close()
+        return
+    results.put(('ready', os.getpid(), None, None))
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            sequence, slot, shape = task
+            try:
+                faces = engine.analyze(ring.view(slot, shape))
+                results.put((sequence, slot, faces, None))
+            except Exception as e:
+                results.put((sequence, slot, None, str(e)))
+    finally:
+        ring.shm.close()
+
+
+class RecognitionPool:
+    """
+    多进程识别工作池
+    检测和识别分布到多个进程中执行，绕开GIL；
+    帧通过共享内存环形缓冲区传递，空闲槽位用尽时提交会阻塞（背压）
+    """
+    def __init__(self, workers=None, slots=None, max_shape=(1080, 1920),
+                 data_dir=None, model_path=None, shards=None, engine=None, start_timeout=60.0):
+        """
+        初始化工作池（调用 start() 后启动进程）
+        Args:
+            workers: 工作进程数，默认为CPU核数
+            slots: 共享内存槽位数，默认为工作进程数的2倍
+            max_shape: 单帧最大尺寸 (高, 宽)
+            data_dir: 用户数据目录
+            model_path: 模型文件路径
+            shards: 图库分片数，None 时自动确定
+            engine: 可选，父进程中已加载的 FaceEngine；Linux 上工作进程以 fork 启动并直接继承它，
+                    不再各自加载模型；其他平台仍按 data_dir、model_path 和 shards 各自加载
+            start_timeout: 等待工作进程加载完成的最长时间（秒）
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.slots = slots or self.workers * 2
+        self.max_shape = max_shape
+        self.data_dir = data_dir
+        self.model_path = model_path
+        self.shards = shards
+        self.engine = engine
+        self.start_timeout = start_timeout
+        self.ring = None
+        self.processes = []
+        self.free_slots = deque()
+        self.sequence = 0  # 下一帧的序号
+        self.in_flight = deque()  # 按提交顺序排列的帧序号
+        self.finished = {}  # 帧序号 -> 已完成的结果
+
+    def start(self):
+        """
+        创建共享内存并启动工作进程，等待所有进程加载模型完成
+        Raises:
+            RuntimeError: 工作进程加载失败、意外退出或启动超时（已启动的进程和共享内存会被清理）
+        """
+        global inherited_engine
+        # macOS 上在OpenCV/ObjC初始化之后 fork 并不安全，只在 Linux 上继承引擎
+        fork = self.engine is not None and sys.platform.startswith('linux')
+        context = mp.get_context('fork' if fork else None)
+        self.ring = FrameRing(self.slots, self.max_shape)
+        self.tasks = context.Queue()
+        self.results = context.Queue()
+        self.free_slots = deque(range(self.slots))
+        inherited_engine = self.engine if fork else None
+        try:
+            for _ in range(self.workers):
+                process = context.Process(
+                    target=worker_main,
+                    args=(self.ring.name, self.slots, self.max_shape, self.data_dir,
+                          self.model_path, self.shards, self.tasks, self.results),
+                    daemon=True,
+                )
+                process.start()
+                self.processes.append(process)
+            self.wait_ready()
+        except BaseException:
+            self.terminate()
+            raise
+        finally:
+            inherited_engine = None
+
+    def wait_ready(self):
+        """
+        等待所有工作进程报告加载完成
+        Raises:
+            RuntimeError: 工作进程加载失败、意外退出或超时
+        """
+        deadline = time.monotonic() + self.start_timeout
+        ready = 0
+        while ready < self.workers:
+            try:
+                _, pid, _, error = self.results.get(timeout=0.5)
+            except queue.Empty:
+                for process in self.processes:
+                    if not process.is_alive():
+                        raise RuntimeError(f"工作进程 {process.pid} 启动时退出（退出码 {process.exitcode}）")
+                if time.monotonic() > deadline:
+                    raise RuntimeError("等待工作进程加载模型超时")
+                continue
+            if error is not None:
+                raise RuntimeError(f"工作进程 {pid} 加载模型失败: {error}")
+            ready += 1
+
+    def terminate(self):
+        """强制结束所有工作进程并释放共享内存（启动失败时使用）"""
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        self.processes = []
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def close(self):
+        """停止工作进程并释放共享内存"""
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.processes = []
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, gray):
+        """
+        提交一帧灰度图像，没有空闲槽位时等待任一帧处理完成
+        Args:
+            gray: 灰度图像
+        Returns:
+            int: 帧序号
+        """
+        while not self.free_slots:
+            self._receive()
+        slot = self.free_slots.popleft()
+        shape = self.ring.write(slot, gray)
+        sequence = self.sequence
+        self.sequence += 1
+        self.in_flight.append(sequence)
+        self.tasks.put((sequence, slot, shape))
+        return sequence
+
+    def next_result(self, timeout=None):
+        """
+        按提交顺序取出下一帧的识别结果
+        Returns:
+            list: 每张人脸的结果字典
+        Raises:
+            RuntimeError: 工作进程处理失败
+        """
+        sequence = self.in_flight[0]
+        while sequence not in self.finished:
+            self._receive(timeout)
+        self.in_flight.popleft()
+        faces, error = self.finished.pop(sequence)
+        if error is not None:
+            raise RuntimeError(error)
+        return faces
+
+    def map(self, frames):
+        """
+        流水线方式处理一系列灰度帧，按输入顺序产出结果
+        Args:
+            frames: 灰度图像的可迭代对象
+        Yields:
+            list: 每帧的识别结果
+        """
+        for gray in frames:
+            # 保持所有槽位都在工作，同时及时产出已完成的结果
+            while len(self.in_flight) >= self.slots or self.in_flight and self.in_flight[0] in self.finished:
+                yield self.next_result()
+            self.submit(gray)
+        while self.in_flight:
+            yield self.next_result()
+
+    def _receive(self, timeout=None):
+        """接收一个工作进程结果，该帧的槽位随即可以复用"""
+        try:
+            sequence, slot, faces, error = self.results.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("等待识别结果超时")
+        self.free_slots.append(slot)
+        self.finished[sequence] = (faces, error)
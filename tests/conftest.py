@@ -0,0 +1,69 @@
+import os  # 文件和目录操作
+import sys  # 系统模块
+
+import cv2  # OpenCV库，用于绘制测试图像
+import numpy as np  # 数值计算库
+import pytest  # 测试框架
+
+# 各模块位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_engine import FaceEngine  # noqa: E402
+
+
+@pytest.fixture
+def rng():
+    """固定种子的随机数生成器"""
+    return np.random.default_rng(0)
+
+
+@pytest.fixture
+def make_engine(tmp_path):
+    """
+    在临时目录中创建并加载引擎，同一测试中多次调用共用同一份数据
+    Returns:
+        function: make_engine(shards=None) -> 已加载的 FaceEngine
+    """
+    def make_engine(shards=None):
+        engine = FaceEngine(data_dir=str(tmp_path / 'face_data'),
+                            model_path=str(tmp_path / 'face_model.yml'), shards=shards)
+        engine.load()
+        return engine
+    return make_engine
+
+
+def random_faces(rng, count):
+    """生成 count 张随机的100x100灰度图像作为人脸样本"""
+    return rng.integers(0, 256, (count, 100, 100), dtype=np.uint8)
+
+
+def enroll_user(engine, faces, name=None):
+    """按图形界面的流程注册一个新用户，返回用户ID"""
+    return engine.register_user({'name': name or f"user{engine.next_user_id()}"}, faces)
+
+
+def draw_face(size=100, variant=0, background=90):
+    """
+    绘制一张能被Haar人脸检测器检测到的简笔人脸
+    Args:
+        size: 人脸大小（约为检测框边长），画面边长为 size 的两倍
+        variant: 改变眼距和嘴宽，生成不同的"用户"
+        background: 背景灰度
+    Returns:
+        numpy.ndarray: 灰度画面，人脸位于中央
+    """
+    image = np.full((size * 2, size * 2), background, dtype=np.uint8)
+    center, scale = size, size / 200
+    eye_offset = 30 + 3 * variant
+    cv2.ellipse(image, (center, center), (int(70 * scale), int(95 * scale)), 0, 0, 360, 200, -1)
+    for dx in (-eye_offset, eye_offset):
+        x = int(center + dx * scale)
+        cv2.ellipse(image, (x, int(center - 25 * scale)), (int(16 * scale), int(8 * scale)),
+                    0, 0, 360, 40, -1)
+        cv2.line(image, (x - int(20 * scale), int(center - 45 * scale)),
+                 (x + int(20 * scale), int(center - 45 * scale)), 60, max(1, int(5 * scale)))
+    cv2.line(image, (center, int(center - 10 * scale)), (center, int(center + 25 * scale)),
+             150, max(1, int(6 * scale)))
+    cv2.ellipse(image, (center, int(center + 50 * scale)), (int((28 + 4 * variant) * scale), int(9 * scale)),
+                0, 0, 360, 70, -1)
+    return cv2.GaussianBlur(image, (5, 5), 0)
@@ -0,0 +1,170 @@
+import io  # 内存字节流
+import os  # 文件和目录操作
+import tarfile  # 备份压缩包
+
+import cv2  # OpenCV库，用于写出测试图片
+import numpy as np  # 数值计算库
+import pytest  # 测试框架
+
+from conftest import draw_face, enroll_user, random_faces
+from face_bulk import BulkImporter, export_gallery, restore_gallery, scan_folder
+
+
+@pytest.fixture
+def photos(tmp_path):
+    """每人一个子目录的图片：alice 和 bob 各两张人脸，nobody 只有空白图片"""
+    root = tmp_path / 'photos'
+    for name, variant in (('alice', 0), ('bob', 6)):
+        (root / name).mkdir(parents=True)
+        for i in range(2):
+            cv2.imwrite(str(root / name / f"{i}.png"), draw_face(150, variant))
+    (root / 'nobody').mkdir()
+    cv2.imwrite(str(root / 'nobody' / '0.png'), np.full((200, 200), 90, dtype=np.uint8))
+    return root
+
+
+def interrupt_after(engine, count):
+    """让引擎在收到 count 个导入条目后中断导入"""
+    def import_users(entries):
+        for i, _ in enumerate(entries, 1):
+            if i == count:
+                raise KeyboardInterrupt
+    engine.import_users = import_users
+
+
+def test_import_folder(make_engine, photos):
+    engine = make_engine()
+    stats = BulkImporter(engine, workers=1).run(scan_folder(str(photos)))
+    assert (stats['imported'], stats['samples'], stats['failed']) == (2, 4, ['nobody'])
+    assert not os.path.exists(engine.journal_path)
+
+    reloaded = make_engine()
+    assert sorted(info['name'] for info in reloaded.users.values()) == ['alice', 'bob']
+    for user_id in reloaded.users:
+        assert len(reloaded.matcher.samples(user_id)) == 2
+        assert os.path.exists(reloaded.sample_path(user_id))
+
+    # 再次运行时跳过已导入的人员
+    stats = BulkImporter(reloaded, workers=1).run(scan_folder(str(photos)))
+    assert (stats['imported'], stats['skipped']) == (0, 2)
+
+
+def test_import_resumes_from_journal(make_engine, photos):
+    engine = make_engine()
+    interrupt_after(engine, 1)
+    with pytest.raises(KeyboardInterrupt):
+        BulkImporter(engine, workers=1).run(scan_folder(str(photos)))
+    assert list(engine.read_journal()) == ['alice']
+
+    # 已完成的人员直接使用保存的样本，不再读取图片
+    for name in os.listdir(photos / 'alice'):
+        cv2.imwrite(str(photos / 'alice' / name), np.full((200, 200), 90, dtype=np.uint8))
+    engine = make_engine()
+    stats = BulkImporter(engine, workers=1).run(scan_folder(str(photos)))
+    assert (stats['imported'], stats['failed']) == (2, ['nobody'])
+    names = {info['name']: user_id for user_id, info in make_engine().users.items()}
+    assert sorted(names) == ['alice', 'bob']
+    assert len(engine.matcher.samples(names['alice'])) == 2
+
+
+def test_enrollment_during_import_gets_a_new_id(make_engine, photos, rng):
+    engine = make_engine()
+    interrupt_after(engine, 1)
+    with pytest.raises(KeyboardInterrupt):
+        BulkImporter(engine, workers=1).run(scan_folder(str(photos)))
+    alice_id = engine.read_journal()['alice']['user_id']
+
+    # 导入中断期间在界面录入的用户不会占用导入日志中的ID
+    gui = make_engine()
+    faces = random_faces(rng, 3)
+    user_id = enroll_user(gui, faces)
+    assert user_id != alice_id
+    with np.load(gui.sample_path(alice_id)) as data:
+        assert len(data['faces']) == 2
+
+    engine = make_engine()
+    BulkImporter(engine, workers=1).run(scan_folder(str(photos)))
+    users = make_engine().users
+    assert len(set(users)) == 3
+    assert users[alice_id]['name'] == 'alice'
+    with np.load(engine.sample_path(user_id)) as data:
+        np.testing.assert_array_equal(data['faces'], faces)
+
+
+def test_enroll_new_user_replaces_stale_samples(make_engine, rng):
+    engine = make_engine()
+    engine.save_samples(0, random_faces(rng, 4))
+    faces = random_faces(rng, 2)
+    user_id = enroll_user(engine, faces)
+    assert user_id == 0
+    with np.load(engine.sample_path(user_id)) as data:
+        np.testing.assert_array_equal(data['faces'], faces)
+
+
+def test_compact_keeps_samples_of_unfinished_import(make_engine, photos, rng):
+    engine = make_engine()
+    interrupt_after(engine, 1)
+    with pytest.raises(KeyboardInterrupt):
+        BulkImporter(engine, workers=1).run(scan_folder(str(photos)))
+    alice_id = engine.read_journal()['alice']['user_id']
+
+    engine = make_engine()
+    enroll_user(engine, random_faces(rng, 2))
+    engine.save_samples(99, random_faces(rng, 2))  # 已删除用户残留的样本文件
+    assert engine.compact()[1] == 1
+    assert os.path.exists(engine.sample_path(alice_id))
+    assert not os.path.exists(engine.sample_path(99))
+
+    BulkImporter(engine, workers=1).run(scan_folder(str(photos)))
+    assert len(make_engine().matcher.samples(alice_id)) == 2
+
+
+def test_export_restore_round_trip(make_engine, rng, tmp_path):
+    engine = make_engine()
+    faces = {enroll_user(engine, random_faces(rng, 3), name): name for name in ('alice', 'bob')}
+    archive = str(tmp_path / 'backup.tar.gz')
+    assert export_gallery(engine, archive) == 2
+    histograms = {user_id: engine.matcher.samples(user_id) for user_id in faces}
+
+    engine.remove_user(0)
+    enroll_user(engine, random_faces(rng, 2), 'carol')
+    assert restore_gallery(engine, archive) == 2
+
+    restored = make_engine()
+    assert {user_id: info['name'] for user_id, info in restored.users.items()} == faces
+    for user_id, samples in histograms.items():
+        np.testing.assert_array_equal(restored.matcher.samples(user_id), samples)
+        assert os.path.exists(restored.sample_path(user_id))
+
+
+def test_restore_rejects_corrupted_archive(make_engine, rng, tmp_path):
+    engine = make_engine()
+    enroll_user(engine, random_faces(rng, 3), 'alice')
+    archive = tmp_path / 'backup.tar.gz'
+    export_gallery(engine, str(archive))
+    enroll_user(engine, random_faces(rng, 3), 'bob')
+    before = {path: open(path, 'rb').read() for path in (engine.model_path, engine.users_file)}
+
+    data = archive.read_bytes()
+    truncated = tmp_path / 'truncated.tar.gz'
+    truncated.write_bytes(data[:len(data) // 2])
+    with pytest.raises(ValueError):
+        restore_gallery(engine, str(truncated))
+
+    # 内容被修改、校验和不符
+    tampered = tmp_path / 'tampered.tar.gz'
+    with tarfile.open(str(archive), 'r:gz') as source, tarfile.open(str(tampered), 'w:gz') as target:
+        for member in source:
+            content = source.extractfile(member).read()
+            if member.name == 'users.json':
+                content = content.replace(b'alice', b'mallory')
+                member.size = len(content)
+            target.addfile(member, io.BytesIO(content))
+    with pytest.raises(ValueError, match="校验"):
+        restore_gallery(engine, str(tampered))
+
+    # 现有数据保持不变，也不留下临时文件
+    assert {path: open(path, 'rb').read() for path in before} == before
+    assert sorted(make_engine().users) == [0, 1]
+    assert not [name for name in os.listdir(tmp_path) if '.restore' in name]
+    assert not os.path.exists(engine.samples_dir + '.restore')
@@ -0,0 +1,120 @@
+import json  # 配置文件读写
+
+import numpy as np  # 数值计算库
+
+from conftest import draw_face
+from face_detection import DetectionRegion, MotionGate, load_regions
+
+
+def scene(offset=None):
+    """静止背景，offset 不为空时在该位置画一个亮块表示运动的物体"""
+    frame = np.full((240, 320), 80, dtype=np.uint8)
+    frame[60:180, 40:120] = 150
+    if offset is not None:
+        frame[100:160, offset:offset + 60] = 250
+    return frame
+
+
+def test_motion_gate_idles_on_static_scene():
+    gate = MotionGate(hold_frames=2, force_interval=0)
+    decisions = [gate.should_detect(scene(), now=i) for i in range(10)]
+    # 第一帧建立背景并检测，保持 hold_frames 帧后静止画面不再检测
+    assert decisions == [True, True] + [False] * 8
+    assert gate.motion_score == 0.0
+    assert gate.detection_ratio == 0.2
+
+
+def test_motion_gate_detects_motion_and_holds():
+    gate = MotionGate(hold_frames=3, force_interval=0)
+    for i in range(5):
+        gate.should_detect(scene(), now=i)
+    assert gate.should_detect(scene(offset=200), now=5)
+    assert gate.motion_score > gate.sensitivity
+    # 包括运动帧在内共检测 hold_frames 帧
+    decisions = [gate.should_detect(scene(), now=6 + i) for i in range(5)]
+    assert decisions == [True, True, False, False, False]
+
+
+def test_motion_gate_forces_periodic_detection():
+    gate = MotionGate(hold_frames=0, force_interval=2.0)
+    decisions = [gate.should_detect(scene(), now=i * 0.5) for i in range(9)]
+    assert decisions == [True, False, False, False, True, False, False, False, True]
+
+
+def test_motion_gate_keeps_detecting_while_tracking():
+    gate = MotionGate(hold_frames=0, force_interval=0)
+    gate.should_detect(scene(), now=0)
+    assert gate.should_detect(scene(), tracking=True, now=1)
+    assert not gate.should_detect(scene(), now=2)
+
+
+def test_motion_gate_reset_rebuilds_background():
+    gate = MotionGate(hold_frames=0, force_interval=0)
+    gate.should_detect(scene(), now=0)
+    assert not gate.should_detect(scene(), now=1)
+    gate.reset()
+    assert gate.should_detect(scene(offset=200), now=2)
+    assert not gate.should_detect(scene(offset=200), now=3)
+
+
+def test_region_crops_to_polygon_bounds():
+    region = DetectionRegion(polygon=[(0.25, 0.1), (0.75, 0.1), (0.75, 1.2), (0.25, 1.2)])
+    gray = np.zeros((200, 400), dtype=np.uint8)
+    cropped, x0, y0 = region.crop(gray)
+    assert (x0, y0) == (100, 20)
+    assert cropped.shape == (180, 201)
+    # 画面尺寸变化时重新计算外接矩形
+    cropped, x0, y0 = region.crop(np.zeros((100, 200), dtype=np.uint8))
+    assert (x0, y0, cropped.shape) == (50, 10, (90, 101))
+
+
+def test_region_accept_maps_back_and_filters_by_polygon():
+    region = DetectionRegion(polygon=[(0.5, 0.0), (1.0, 0.0), (1.0, 0.5)], adaptive=False)
+    region.crop(np.zeros((200, 200), dtype=np.uint8))
+    # 三角形区域的外接矩形左上角为 (100, 0)
+    faces = region.accept([(50, 0, 20, 20), (0, 80, 20, 20)], 100, 0)
+    assert faces.tolist() == [[150, 0, 20, 20]]
+    assert region.accept([], 100, 0).shape == (0, 4)
+
+
+def test_region_size_range_adapts_and_rescans():
+    region = DetectionRegion(min_face=40, warmup=5, margin=0.5, full_scan_interval=4)
+    assert region.size_range() == ((40, 40), (0, 0))
+    for _ in range(5):
+        region.accept([(0, 0, 100, 100)], 0, 0)
+    assert region.size_range() == ((50, 50), (151, 151))
+    assert region.size_range() == ((50, 50), (151, 151))
+    # 每隔 full_scan_interval 次使用完整范围
+    assert region.size_range() == ((40, 40), (0, 0))
+    region.reset()
+    assert region.size_range() == ((40, 40), (0, 0))
+
+
+def test_region_size_range_respects_limits():
+    assert DetectionRegion(min_face=80, max_face=60).size_range() == ((80, 80), (80, 80))
+    fixed = DetectionRegion(min_face=30, max_face=120, adaptive=False)
+    fixed.accept([(0, 0, 50, 50)] * 40, 0, 0)
+    assert fixed.size_range() == ((30, 30), (120, 120))
+
+
+def test_engine_detects_only_inside_region(make_engine):
+    engine = make_engine()
+    frame = draw_face(150)
+    inside = DetectionRegion(polygon=[(0.1, 0.1), (0.9, 0.1), (0.9, 0.9), (0.1, 0.9)], min_face=60)
+    outside = DetectionRegion(polygon=[(0.0, 0.0), (0.4, 0.0), (0.4, 1.0), (0.0, 1.0)], min_face=60)
+    faces = engine.detect(frame, inside)
+    assert len(faces) == 1
+    assert np.abs(faces - engine.detect(frame)).max() <= 2
+    assert len(engine.detect(frame, outside)) == 0
+
+
+def test_load_regions(tmp_path):
+    path = tmp_path / 'regions.json'
+    path.write_text(json.dumps({
+        0: {'polygon': [[0.2, 0.1], [0.8, 0.1], [0.8, 0.9]], 'min_face': 80},
+        'rtsp://cam': {'adaptive': False},
+    }), encoding='utf-8')
+    regions = load_regions(str(path))
+    assert sorted(regions) == ['0', 'rtsp://cam']
+    assert regions['0'].min_face == 80 and regions['0'].polygon.shape == (3, 2)
+    assert regions['rtsp://cam'].polygon is None and not regions['rtsp://cam'].adaptive
@@ -0,0 +1,62 @@
+import os  # 文件和目录操作
+
+import numpy as np  # 数值计算库
+
+from conftest import draw_face
+from face_detector import FaceRecognitionSystem
+
+
+class StatusLabel:
+    """代替tkinter标签，记录最近一次设置的文本"""
+    text = None
+
+    def config(self, text=None, **kwargs):
+        self.text = text
+
+
+def face_crops(variant, count=3):
+    """同一"用户"略有偏移的多张人脸区域"""
+    frame = draw_face(150, variant)
+    return [frame[70 + offset:230 + offset, 70:230] for offset in range(0, 4 * count, 4)]
+
+
+def make_app(engine):
+    """不创建窗口的界面对象，只初始化验证流程用到的属性"""
+    app = FaceRecognitionSystem.__new__(FaceRecognitionSystem)
+    app.engine = engine
+    app.cap = None
+    app.roi_batch = np.empty((1, 100, 100), dtype=np.uint8)
+    app.status_label = StatusLabel()
+    return app
+
+
+def test_verification_batch_recognizes_every_face_in_one_call(make_engine):
+    engine = make_engine()
+    for user_id, variant in ((0, 0), (1, 6)):
+        engine.users[user_id] = {'name': f"user{user_id}"}
+        engine.enroll(user_id, [np.array(crop) for crop in face_crops(variant)])
+    calls = []
+    recognize = engine.recognize
+    engine.recognize = lambda faces: calls.append(len(faces)) or recognize(faces)
+
+    app = make_app(engine)
+    results = app.handle_verification_batch([face_crops(0)[1], face_crops(6)[1]])
+
+    assert calls == [2]
+    assert [user_id for user_id, _, _ in results] == [0, 1]
+    assert app.last_verify_result
+    assert "user0" in app.status_label.text and "user1" in app.status_label.text
+    assert all('last_verified' in engine.users[user_id] for user_id in (0, 1))
+    assert sorted(engine.load_users()) == [0, 1]
+    assert all('last_verified' in user for user in engine.load_users().values())
+
+
+def test_verification_batch_reports_unknown_faces(make_engine):
+    engine = make_engine()
+    app = make_app(engine)
+    results = app.handle_verification_batch([face_crops(0)[0]])
+    assert [user_info for _, _, user_info in results] == [None]
+    assert not app.last_verify_result
+    assert app.status_label.text.startswith("验证失败")
+    assert not engine.verified
+    assert not os.path.exists(engine.users_file)
@@ -0,0 +1,175 @@
+import glob  # 文件匹配
+import os  # 文件和目录操作
+import threading  # 多线程处理
+
+import numpy as np  # 数值计算库
+
+from conftest import draw_face, enroll_user, random_faces
+from face_matcher import count_model_labels
+
+
+def test_delete_then_enroll_does_not_inherit_samples(make_engine, rng):
+    engine = make_engine()
+    old_faces = random_faces(rng, 3)
+    ids = [enroll_user(engine, random_faces(rng, 3)) for _ in range(2)]
+    ids.append(enroll_user(engine, old_faces))
+    assert ids == [0, 1, 2]
+
+    engine.remove_user(2)
+    assert count_model_labels(engine.model_path) == 6
+    assert not os.path.exists(engine.sample_path(2))
+
+    new_faces = random_faces(rng, 3)
+    user_id = enroll_user(engine, new_faces)
+    reloaded = make_engine()
+    assert len(reloaded.matcher.samples(user_id)) == 3
+    np.testing.assert_array_equal(reloaded.matcher.samples(user_id), reloaded.histograms(new_faces))
+
+
+def test_new_ids_skip_users_with_samples(make_engine, rng):
+    engine = make_engine()
+    for _ in range(3):
+        enroll_user(engine, random_faces(rng, 2))
+    engine.remove_user(1)
+    assert engine.next_user_id() == 3
+
+
+def test_concurrent_detect(make_engine):
+    engine = make_engine()
+    frames = [draw_face(size) for size in (100, 150)]
+    expected = [engine.detect(frame).tolist() for frame in frames]
+    assert all(len(boxes) == 1 for boxes in expected)
+    errors = []
+
+    def detect():
+        try:
+            for _ in range(3):
+                assert [engine.detect(frame).tolist() for frame in frames] == expected
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=detect) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+
+def test_reload_keeps_user_registered_during_load(make_engine, rng):
+    engine = make_engine()
+    enroll_user(engine, random_faces(rng, 2))
+    loading, resume = threading.Event(), threading.Event()
+    load_users = engine.load_users
+
+    def slow_load_users():
+        # 只阻塞重新加载线程的第一次读取
+        if threading.current_thread() is reloader and not loading.is_set():
+            loading.set()
+            resume.wait(5)
+        return load_users()
+    engine.load_users = slow_load_users
+
+    reloader = threading.Thread(target=engine.reload)
+    reloader.start()
+    assert loading.wait(5)
+    user_id = enroll_user(engine, random_faces(rng, 2))
+    resume.set()
+    reloader.join()
+
+    assert user_id == 1
+    assert sorted(engine.users) == [0, 1]
+    assert sorted(engine.matcher.user_ids()) == [0, 1]
+
+
+def test_users_only_change_keeps_matcher(make_engine, rng):
+    engine = make_engine()
+    enroll_user(engine, random_faces(rng, 2))
+    other = make_engine()
+    other.record_verification([0], '2026-01-01 08:00:00')
+
+    matcher = engine.matcher
+    assert engine.reload_if_changed()
+    assert engine.matcher is matcher
+    assert engine.users[0]['last_verified'] == '2026-01-01 08:00:00'
+    assert not engine.reload_if_changed()
+
+
+def test_verification_saves_are_throttled(make_engine, rng):
+    engine = make_engine()
+    enroll_user(engine, random_faces(rng, 2))
+    saves = []
+    save_users = engine.save_users
+    engine.save_users = lambda *args: saves.append(1) or save_users(*args)
+
+    engine.verified_saved = 0.0
+    for second in range(5):
+        engine.record_verification([0], f"2026-01-01 08:00:0{second}")
+    assert len(saves) == 1
+    assert engine.users[0]['last_verified'] == '2026-01-01 08:00:04'
+    assert engine.load_users()[0]['last_verified'] == '2026-01-01 08:00:00'
+
+    engine.flush_verifications()
+    engine.flush_verifications()
+    assert len(saves) == 2
+    assert engine.load_users()[0]['last_verified'] == '2026-01-01 08:00:04'
+
+
+def test_pending_verifications_survive_reload_and_merge(make_engine, rng):
+    engine = make_engine()
+    enroll_user(engine, random_faces(rng, 2))
+    other = make_engine()
+    engine.verified_saved = float('inf')  # 不自动写入
+    engine.record_verification([0], '2026-01-01 08:00:00')
+    enroll_user(other, random_faces(rng, 2))
+
+    assert engine.reload_if_changed()
+    assert sorted(engine.users) == [0, 1]
+    assert engine.users[0]['last_verified'] == '2026-01-01 08:00:00'
+    engine.flush_verifications()
+    users = make_engine().users
+    assert sorted(users) == [0, 1]
+    assert users[0]['last_verified'] == '2026-01-01 08:00:00'
+
+
+def test_reshard_keeps_every_user_in_its_shard(make_engine, rng, tmp_path):
+    engine = make_engine()
+    ids = [enroll_user(engine, random_faces(rng, 2)) for _ in range(6)]
+
+    for shards in (2, 4, 3):
+        engine = make_engine(shards)
+        assert sorted(engine.matcher.user_ids()) == ids
+        for user_id in ids:
+            assert user_id in engine.matcher.shard_for(user_id)
+        assert len(glob.glob(str(tmp_path / 'face_model.shard*.yml'))) == shards
+
+    engine.remove_user(3)
+    assert 3 not in make_engine(3).matcher
+
+    engine = make_engine(1)
+    assert sorted(engine.matcher.user_ids()) == [0, 1, 2, 4, 5]
+    assert not glob.glob(str(tmp_path / 'face_model.shard*.yml'))
+    assert count_model_labels(engine.model_path) == 10
+
+
+def test_shard_files_are_read_outside_the_lock(make_engine, rng):
+    engine = make_engine()
+    for _ in range(3):
+        enroll_user(engine, random_faces(rng, 2))
+
+    for shards in (2, 2, 1):
+        engine = make_engine(shards)
+        saved = []
+        load_users = engine.load_users
+
+        def load_users_while_saving():
+            # 加载期间其他线程保存用户数据不会被阻塞（保存后本次加载结果被丢弃重试）
+            if not saved:
+                saver = threading.Thread(target=lambda: saved.append(engine.save_users()))
+                saver.start()
+                saver.join(2)
+            return load_users()
+        engine.load_users = load_users_while_saving
+        engine.reload()
+        assert saved
+        assert sorted(engine.matcher.user_ids()) == [0, 1, 2]
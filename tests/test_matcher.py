@@ -0,0 +1,35 @@
+import cv2  # OpenCV库，作为参考实现
+import numpy as np  # 数值计算库
+
+from conftest import random_faces
+from face_matcher import CentroidMatcher, chi_square_distances, lbp_histograms
+
+
+def lbph_histograms(faces):
+    """用OpenCV的LBPH训练后取出的直方图作为参考结果"""
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.train(list(faces), np.arange(len(faces)))
+    return np.vstack([np.asarray(h, dtype=np.float32).reshape(1, -1)
+                      for h in recognizer.getHistograms()])
+
+
+def test_lbp_histograms_match_opencv(rng):
+    faces = random_faces(rng, 4)
+    np.testing.assert_allclose(lbp_histograms(faces), lbph_histograms(faces), atol=1e-6)
+
+
+def test_chi_square_matches_compare_hist(rng):
+    hists = lbp_histograms(random_faces(rng, 3))
+    distances = chi_square_distances(hists[:1], hists)
+    expected = [cv2.compareHist(hists[0], other, cv2.HISTCMP_CHISQR_ALT) for other in hists]
+    np.testing.assert_allclose(distances[0], expected, rtol=1e-4)
+
+
+def test_matcher_finds_enrolled_samples(rng):
+    matcher = CentroidMatcher(top_k=2)
+    faces = {user_id: random_faces(rng, 3) for user_id in range(5)}
+    for user_id, samples in faces.items():
+        matcher.add(user_id, matcher.histograms(samples))
+    for user_id, samples in faces.items():
+        assert [result[0] for result in matcher.predict_batch(samples)] == [user_id] * 3
+        assert all(distance < 1e-3 for _, distance in matcher.predict_batch(samples))
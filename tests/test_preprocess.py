@@ -0,0 +1,122 @@
+import cv2  # OpenCV库，作为参考实现
+import numpy as np  # 数值计算库
+import pytest  # 测试框架
+
+from conftest import enroll_user, random_faces
+from face_preprocess import FacePreprocessor
+
+
+class FakeEyes:
+    """代替人眼检测器，返回固定的双眼位置"""
+    def __init__(self, eyes):
+        self.eyes = eyes
+
+    def detectMultiScale(self, image, **kwargs):
+        return self.eyes
+
+
+def aligner(eyes):
+    """只做人眼对齐、使用固定双眼位置的预处理器"""
+    preprocessor = FacePreprocessor(align=True)
+    preprocessor.local.eye_cascade = FakeEyes(eyes)
+    return preprocessor
+
+
+def test_disabled_preprocessor_returns_input(rng):
+    faces = random_faces(rng, 2)
+    preprocessor = FacePreprocessor()
+    assert not preprocessor.enabled
+    assert preprocessor.apply(faces) is faces
+
+
+def test_gamma_uses_lookup_table_without_modifying_input(rng):
+    faces = random_faces(rng, 3)
+    original = faces.copy()
+    result = FacePreprocessor(gamma=2.0).apply(faces)
+    expected = np.round(255.0 * (original / 255.0) ** 0.5).astype(np.uint8)
+    np.testing.assert_array_equal(result, expected)
+    np.testing.assert_array_equal(faces, original)
+
+
+@pytest.mark.parametrize('equalize', ['hist', 'clahe'])
+def test_equalization_matches_opencv(rng, equalize):
+    faces = rng.integers(60, 120, (3, 100, 100), dtype=np.uint8)
+    result = FacePreprocessor(equalize=equalize, clip_limit=3.0, tile_size=4).apply(faces)
+    if equalize == 'hist':
+        expected = [cv2.equalizeHist(face) for face in faces]
+    else:
+        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(4, 4))
+        expected = [clahe.apply(face) for face in faces]
+    np.testing.assert_array_equal(result, np.array(expected))
+
+
+def test_steps_run_in_order(rng):
+    faces = rng.integers(60, 120, (2, 100, 100), dtype=np.uint8)
+    result = FacePreprocessor(gamma=1.5, equalize='hist').apply(faces)
+    expected = [cv2.equalizeHist(face) for face in FacePreprocessor(gamma=1.5).apply(faces)]
+    np.testing.assert_array_equal(result, np.array(expected))
+    assert FacePreprocessor(equalize='hist').apply(np.empty((0, 100, 100), np.uint8)).shape == (0, 100, 100)
+
+
+def test_align_rotates_eyes_level(rng):
+    face = random_faces(rng, 1)
+    # 双眼中心 (25, 35) 和 (65, 45)，连线约倾斜 14 度
+    result = aligner([(20, 30, 10, 10), (60, 40, 10, 10)]).apply(face)
+    angle = np.degrees(np.arctan2(10, 40))
+    matrix = cv2.getRotationMatrix2D((50, 50), angle, 1.0)
+    expected = cv2.warpAffine(face[0], matrix, (100, 100), borderMode=cv2.BORDER_REPLICATE)
+    np.testing.assert_array_equal(result[0], expected)
+
+
+@pytest.mark.parametrize('eyes', [
+    [],  # 未检测到双眼
+    [(20, 30, 10, 10), (60, 30, 10, 10)],  # 已经水平
+    [(20, 10, 10, 10), (40, 40, 10, 10)],  # 角度过大，视为误检
+])
+def test_align_keeps_face_without_reliable_eyes(rng, eyes):
+    face = random_faces(rng, 1)
+    np.testing.assert_array_equal(aligner(eyes).apply(face), face)
+
+
+def test_config_round_trip(tmp_path):
+    path = str(tmp_path / 'preprocess.json')
+    assert FacePreprocessor.load(path) == FacePreprocessor()
+    preprocessor = FacePreprocessor(equalize='clahe', clip_limit=3.0, gamma=1.2, align=True)
+    preprocessor.save(path)
+    assert FacePreprocessor.load(path) == preprocessor
+    with pytest.raises(ValueError):
+        FacePreprocessor(equalize='sharpen')
+    with pytest.raises(ValueError):
+        FacePreprocessor(gamma=0)
+
+
+def test_enroll_and_recapture_store_raw_samples(make_engine, rng):
+    engine = make_engine()
+    engine.set_preprocessing(FacePreprocessor(equalize='hist'))
+    first, second = random_faces(rng, 2), random_faces(rng, 3)
+    user_id = enroll_user(engine, first)
+    engine.enroll(user_id, second)
+    with np.load(engine.sample_path(user_id)) as data:
+        np.testing.assert_array_equal(data['faces'], np.concatenate([first, second]))
+
+    recaptured = random_faces(rng, 4)
+    engine.replace_samples(user_id, recaptured)
+    with np.load(engine.sample_path(user_id)) as data:
+        np.testing.assert_array_equal(data['faces'], recaptured)
+
+
+def test_set_preprocessing_rebuilds_from_raw_samples(make_engine, rng):
+    engine = make_engine()
+    faces = random_faces(rng, 3)
+    user_id = enroll_user(engine, faces)
+    engine.users[7] = {'name': 'legacy'}
+    engine.import_users([(7, engine.users[7], engine.histograms(random_faces(rng, 2)))])
+
+    preprocessor = FacePreprocessor(gamma=1.5, equalize='clahe')
+    assert engine.set_preprocessing(preprocessor) == [7]
+    expected = engine.matcher.histograms(preprocessor.apply(faces))
+    np.testing.assert_array_equal(engine.matcher.samples(user_id), expected)
+
+    reloaded = make_engine()
+    assert reloaded.preprocessor == preprocessor
+    np.testing.assert_array_equal(reloaded.matcher.samples(user_id), expected)
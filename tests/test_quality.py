@@ -0,0 +1,43 @@
+import cv2  # OpenCV库，用于构造低质量样本
+import numpy as np  # 数值计算库
+
+from conftest import draw_face
+from face_quality import FaceQualityChecker, SampleSelector
+
+
+def face_roi(offset=0):
+    """检测框大小的人脸区域，offset 为垂直偏移（模拟头部移动）"""
+    return draw_face(150)[70 + offset:230 + offset, 70:230]
+
+
+def test_checker_accepts_clear_frontal_face():
+    assert FaceQualityChecker().check(face_roi()) == (True, "")
+
+
+def test_checker_rejection_reasons():
+    checker = FaceQualityChecker()
+    roi = face_roi()
+    assert checker.check(roi[:60, :60]) == (False, "人脸过小")
+    assert checker.check(roi // 4) == (False, "光线过暗")
+    assert checker.check(np.clip(roi.astype(np.int16) + 120, 0, 255).astype(np.uint8)) == (False, "光线过亮")
+    assert checker.check(cv2.GaussianBlur(roi, (31, 31), 0)) == (False, "图像模糊")
+    shaded = roi.copy()
+    shaded[:, :80] //= 3
+    assert checker.check(shaded) == (False, "请正对摄像头")
+
+
+def test_selector_rejects_duplicates_and_stops_at_target():
+    selector = SampleSelector(target=3)
+    assert selector.offer(face_roi(0)) == (True, "")
+    assert selector.offer(face_roi(1)) == (False, "与已有样本过于相似")
+    assert selector.offer(face_roi(12))[0]
+    assert selector.offer(face_roi(24))[0]
+    assert selector.is_complete
+    assert selector.offer(face_roi(36)) == (False, "样本已足够")
+    assert [sample.shape for sample in selector.samples] == [(100, 100)] * 3
+
+
+def test_selector_skips_low_quality_frames():
+    selector = SampleSelector(target=2)
+    assert selector.offer(cv2.GaussianBlur(face_roi(), (31, 31), 0)) == (False, "图像模糊")
+    assert len(selector) == 0
@@ -0,0 +1,148 @@
+import time  # 时间处理
+
+import cv2  # OpenCV库，用于写出测试图片
+import numpy as np  # 数值计算库
+import pytest  # 测试框架
+
+from face_detector import FaceRecognitionSystem
+from face_replay import FrameRecorder, ReplaySource, compare_runs, parse_pacing
+
+
+@pytest.fixture
+def frames_dir(tmp_path):
+    """5帧图片序列，第3张无法解码"""
+    root = tmp_path / 'frames'
+    root.mkdir()
+    for i in range(5):
+        if i == 2:
+            (root / f"{i:03d}.png").write_bytes(b'not an image')
+        else:
+            cv2.imwrite(str(root / f"{i:03d}.png"), np.full((40, 40, 3), i * 40, dtype=np.uint8))
+    return root
+
+
+def read_all(source):
+    """读取全部帧，返回 (帧亮度, 录像时间) 列表和耗时"""
+    start = time.perf_counter()
+    frames = []
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append((int(frame[0, 0, 0]), source.timestamp))
+    return frames, time.perf_counter() - start
+
+
+def test_replay_skips_unreadable_images(frames_dir):
+    source = ReplaySource(str(frames_dir), pacing='max', fps=10)
+    frames, elapsed = read_all(source)
+    # 跳过的图片仍占用录像时间
+    assert frames == [(0, 0.0), (40, 0.1), (120, 0.3), (160, 0.4)]
+    assert elapsed < 0.1
+    assert source.get(cv2.CAP_PROP_FRAME_COUNT) == 5
+    source.release()
+    assert not source.isOpened()
+
+
+@pytest.mark.parametrize('pacing, fps, duration', [('realtime', 25, 0.16), (20, 100, 0.2)])
+def test_replay_paces_frames(frames_dir, pacing, fps, duration):
+    _, elapsed = read_all(ReplaySource(str(frames_dir), pacing=pacing, fps=fps))
+    assert duration * 0.9 <= elapsed < duration + 0.15
+
+
+def test_replay_rejects_bad_sources(tmp_path):
+    with pytest.raises(ValueError):
+        ReplaySource(str(tmp_path))
+    with pytest.raises(ValueError):
+        ReplaySource(str(tmp_path / 'missing.mp4'))
+    with pytest.raises(ValueError):
+        parse_pacing('0')
+    assert parse_pacing('12.5') == 12.5
+
+
+def record(path, frames):
+    """写出记录文件，frames 为 (检测决策, 用户ID, 耗时) 列表"""
+    recorder = FrameRecorder(str(path))
+    for index, (detected, user_id, latency_ms) in enumerate(frames):
+        faces = [{'box': [10, 10, 50, 50], 'user_id': user_id, 'confidence': 30.0}] if detected else []
+        recorder.record(index, detected, faces, latency_ms)
+    recorder.close()
+    return str(path)
+
+
+def test_compare_runs(tmp_path):
+    frames = [(True, 0, 10.0), (False, None, 2.0), (True, 1, 10.0), (True, 1, 10.0)]
+    baseline = record(tmp_path / 'baseline.jsonl', frames)
+
+    same = compare_runs(baseline, record(tmp_path / 'same.jsonl', frames))
+    assert (same['frames'], same['mismatched'], same['regressions']) == (4, 0, [])
+
+    changed = frames[:2] + [(True, 2, 10.0), (True, 1, 10.0)]
+    result = compare_runs(baseline, record(tmp_path / 'changed.jsonl', changed))
+    assert result['mismatched'] == 1 and len(result['regressions']) == 1
+
+    slower = [(detected, user_id, latency * 2) for detected, user_id, latency in frames[:3]]
+    result = compare_runs(baseline, record(tmp_path / 'slower.jsonl', slower))
+    assert result['missing'] == 1
+    assert result['latency']['p50'] == (10.0, 20.0)
+    assert len(result['regressions']) == 3
+
+
+class FakeCapture:
+    """视频源替身，read() 时执行 on_read 后报告读取失败"""
+    def __init__(self, opened=True, on_read=None):
+        self.opened = opened
+        self.on_read = on_read
+        self.released = False
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        if self.on_read is not None:
+            self.on_read()
+        return False, None
+
+    def release(self):
+        self.released = True
+
+
+class FakeRecorder:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_start_camera_reports_closed_capture(monkeypatch):
+    import face_detector
+
+    capture = FakeCapture(opened=False)
+    errors = []
+    monkeypatch.setattr(face_detector, 'open_capture', lambda source, pacing: capture)
+    monkeypatch.setattr(face_detector.messagebox, 'showerror', lambda *args: errors.append(args))
+    app = FaceRecognitionSystem.__new__(FaceRecognitionSystem)
+    app.cap, app.video_source, app.pacing = None, 0, None
+
+    assert app.start_camera() is False
+    assert capture.released and app.cap is None
+    assert errors
+
+
+def test_finished_frame_thread_leaves_new_session_alone():
+    app = FaceRecognitionSystem.__new__(FaceRecognitionSystem)
+    old_recorder, new_recorder = FakeRecorder(), FakeRecorder()
+    new_capture = FakeCapture()
+
+    def restart():
+        # 读取期间停止并重新开始了一次采集
+        app.cap, app.recorder = new_capture, new_recorder
+
+    app.is_running = True
+    app.cap, app.recorder = FakeCapture(on_read=restart), old_recorder
+    app.update_frame()
+
+    assert old_recorder.closed
+    assert not new_recorder.closed and app.recorder is new_recorder
+    assert not new_capture.released and app.cap is new_capture
+    app.cap = None
@@ -0,0 +1,112 @@
+import http.client  # 本地HTTP客户端
+import json  # JSON编解码
+import threading  # 多线程处理
+import time  # 时间处理
+
+import cv2  # OpenCV库，用于编码请求图像
+import pytest  # 测试框架
+
+from conftest import draw_face
+from face_service import RecognitionHandler, RecognitionServer, RecognitionService
+
+
+@pytest.fixture
+def engine(make_engine):
+    """注册了一个简笔人脸用户的引擎"""
+    engine = make_engine()
+    frame = draw_face(150)
+    engine.users[0] = {'name': 'alice'}
+    engine.enroll(0, [frame[70 + offset:230 + offset, 70:230] for offset in (0, 4, 8)])
+    return engine
+
+
+@pytest.fixture
+def server(engine):
+    """在随机端口上运行的识别服务，返回 (服务, 端口)"""
+    service = RecognitionService(engine, max_pending=32)
+    service.start()
+    server = RecognitionServer(('127.0.0.1', 0), RecognitionHandler)
+    server.service = service
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield service, server.server_address[1]
+    server.shutdown()
+    server.server_close()
+    service.stop()
+
+
+def post(port, body, content_type='image/png', path='/recognize'):
+    """发送POST请求，返回 (状态码, JSON响应)"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        connection.request('POST', path, body=body, headers={'Content-Type': content_type})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def test_recognize_over_http(server):
+    _, port = server
+    status, payload = post(port, cv2.imencode('.png', draw_face(150))[1].tobytes())
+    assert status == 200
+    assert [(face['user_id'], face['name']) for face in payload['faces']] == [(0, 'alice')]
+
+
+def test_concurrent_requests_share_batches(server):
+    _, port = server
+    body = cv2.imencode('.png', draw_face(150))[1].tobytes()
+    responses = []
+
+    def request():
+        responses.append(post(port, body))
+
+    threads = [threading.Thread(target=request) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(responses) == 16
+    assert all(status == 200 and [face['user_id'] for face in payload['faces']] == [0]
+               for status, payload in responses)
+
+
+def test_bad_requests(server):
+    _, port = server
+    assert post(port, b'not an image')[0] == 400
+    assert post(port, b'\0' * 10, 'application/octet-stream')[0] == 400
+    assert post(port, b'x', path='/unknown')[0] == 404
+
+
+def test_busy_service_rejects_requests(engine):
+    service = RecognitionService(engine, max_pending=1)
+    assert service.slots.acquire(blocking=False)
+    server = RecognitionServer(('127.0.0.1', 0), RecognitionHandler)
+    server.service = service
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        status, _ = post(server.server_address[1], cv2.imencode('.png', draw_face(150))[1].tobytes())
+        assert status == 503
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_timed_out_requests_are_dropped(engine):
+    service = RecognitionService(engine, max_pending=1, timeout=0.05)
+    processed = []
+    service.process = processed.append
+
+    with pytest.raises(TimeoutError):
+        service.submit(draw_face(150))
+    # 超时后名额立即释放，排队中的请求被批处理线程丢弃
+    assert service.slots.acquire(blocking=False)
+    service.slots.release()
+    service.start()
+    deadline = time.monotonic() + 5
+    while not service.pending.empty() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    service.stop()
+    assert service.pending.empty()
+    assert processed == []
@@ -0,0 +1,100 @@
+import asyncio  # 异步IO
+import threading  # 多线程处理
+import time  # 时间处理
+
+import cv2  # OpenCV库，用于写入测试帧
+
+import face_stream
+from conftest import draw_face
+from face_stream import AsyncFrameSource, watch_sources
+
+
+class FakeCapture:
+    """模拟视频源：read() 可以阻塞，记录释放时是否仍有读取在进行"""
+    def __init__(self, frames=3, stuck=None):
+        self.frames = frames
+        self.stuck = stuck  # 设置后 read() 阻塞直到该事件被触发
+        self.reading = False
+        self.released = threading.Event()
+        self.released_during_read = False
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        self.reading = True
+        try:
+            if self.stuck is not None:
+                self.stuck.wait()
+            if self.frames == 0:
+                return False, None
+            self.frames -= 1
+            return True, draw_face(100)
+        finally:
+            self.reading = False
+
+    def release(self):
+        self.released_during_read = self.reading
+        self.released.set()
+
+
+def open_fake(monkeypatch, cap):
+    monkeypatch.setattr(face_stream, 'open_capture', lambda source, pacing=None: cap)
+
+
+def test_frames_are_read_until_the_end_and_released(monkeypatch):
+    cap = FakeCapture(frames=3)
+    open_fake(monkeypatch, cap)
+
+    async def read_all():
+        return [frame.shape async for frame in AsyncFrameSource(0)]
+
+    assert asyncio.run(read_all()) == [(200, 200)] * 3
+    assert cap.released.is_set()
+
+
+def test_cancel_with_stuck_read_stops_quickly_and_releases_later(monkeypatch):
+    stuck = threading.Event()
+    cap = FakeCapture(stuck=stuck)
+    open_fake(monkeypatch, cap)
+
+    async def run():
+        source = AsyncFrameSource(0, close_timeout=0.2)
+
+        async def consume():
+            async for _ in source:
+                pass
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        start = time.perf_counter()
+        await asyncio.gather(task, return_exceptions=True)
+        return time.perf_counter() - start
+
+    assert asyncio.run(run()) < 1.0
+    assert not cap.released.is_set()  # 读取仍在进行，不能释放
+    stuck.set()
+    assert cap.released.wait(2.0)
+    assert not cap.released_during_read
+
+
+def test_watch_sources_processes_every_source(make_engine, tmp_path):
+    engine = make_engine()
+    sources = []
+    for name in ('a', 'b'):
+        folder = tmp_path / name
+        folder.mkdir()
+        for i in range(3):
+            cv2.imwrite(str(folder / f"{i:03d}.png"), draw_face(120))
+        sources.append(str(folder))
+    results = []
+
+    asyncio.run(watch_sources(engine, sources, lambda source, result: results.append((source, result))))
+    for source in sources:
+        frames = [result for name, result in results if name == source]
+        assert [result['index'] for result in frames] == [1, 2, 3]
+        assert all(len(result['faces']) == 1 for result in frames)
@@ -0,0 +1,66 @@
+import numpy as np  # 数值计算库
+import pytest  # 测试框架
+
+from conftest import draw_face, random_faces
+from face_matcher import ShardedMatcher
+from face_workers import FrameRing, RecognitionPool
+
+
+@pytest.fixture
+def engine(make_engine):
+    """注册了两个简笔人脸用户的引擎"""
+    engine = make_engine()
+    for user_id, variant in ((0, 0), (1, 6)):
+        frame = draw_face(150, variant)
+        engine.users[user_id] = {'name': f"user{user_id}"}
+        engine.enroll(user_id, [frame[70 + offset:230 + offset, 70:230] for offset in (0, 4, 8)])
+    engine.save_users()
+    return engine
+
+
+def frames():
+    """包含已注册用户人脸的帧，最后一帧没有人脸"""
+    return [draw_face(150, 0), draw_face(150, 6), draw_face(150, 0),
+            np.full((300, 300), 90, dtype=np.uint8)]
+
+
+@pytest.mark.parametrize('inherit', [True, False])
+def test_pool_matches_in_process_results(engine, inherit):
+    expected = [engine.analyze(frame) for frame in frames()]
+    assert [[face['user_id'] for face in faces] for faces in expected] == [[0], [1], [0], []]
+    with RecognitionPool(workers=2, max_shape=(300, 300), data_dir=engine.data_dir,
+                         model_path=engine.model_path, engine=engine if inherit else None) as pool:
+        assert list(pool.map(frames())) == expected
+
+
+def test_pool_start_fails_fast_when_model_is_broken(make_engine):
+    engine = make_engine()
+    with open(engine.model_path, 'w') as f:
+        f.write('not a model')
+    pool = RecognitionPool(workers=2, max_shape=(64, 64), data_dir=engine.data_dir,
+                           model_path=engine.model_path, start_timeout=10)
+    with pytest.raises(RuntimeError):
+        pool.start()
+    assert pool.processes == [] and pool.ring is None
+
+
+def test_frame_ring_round_trip():
+    ring = FrameRing(2, (20, 30))
+    try:
+        gray = random_faces(np.random.default_rng(0), 1)[0][:20, :30]
+        shape = ring.write(1, gray)
+        np.testing.assert_array_equal(ring.view(1, shape), gray)
+        with pytest.raises(ValueError):
+            ring.write(0, np.zeros((21, 30), dtype=np.uint8))
+    finally:
+        ring.close()
+
+
+def test_sharded_matcher_without_executor_queries_every_shard(rng):
+    matcher = ShardedMatcher(3)
+    faces = {user_id: random_faces(rng, 2) for user_id in range(6)}
+    for user_id, samples in faces.items():
+        matcher.add(user_id, matcher.histograms(samples))
+    matcher.executor = None
+    for user_id, samples in faces.items():
+        assert [result[0] for result in matcher.predict_batch(samples)] == [user_id] * 2